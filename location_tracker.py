@@ -1,750 +1,997 @@
-"""
-Location-based Carbon Tracking
-Automatically detects transport modes and calculates emissions based on location data
-"""
-
-import json
-import math
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
-import requests
-from geopy.distance import geodesic
-import numpy as np
-
-class LocationTracker:
-    def __init__(self, google_maps_api_key: str = None):
-        self.google_maps_api_key = google_maps_api_key
-        self.location_history = []
-        self.transport_thresholds = {
-            'walking': {'min_speed': 0, 'max_speed': 8},      # km/h
-            'cycling': {'min_speed': 8, 'max_speed': 35},     # km/h
-            'driving': {'min_speed': 20, 'max_speed': 150},   # km/h
-            'public_transport': {'min_speed': 15, 'max_speed': 80},  # km/h
-            'flight': {'min_speed': 300, 'max_speed': 1000}   # km/h
-        }
-        
-        # Emission factors for different transport modes (kg CO2 per km)
-        self.emission_factors = {
-            'walking': 0.0,
-            'cycling': 0.0,
-            'e_bike': 0.005,
-            'car_petrol': 0.21,
-            'car_diesel': 0.17,
-            'car_hybrid': 0.12,
-            'car_electric': 0.05,
-            'bus': 0.089,
-            'train': 0.041,
-            'subway': 0.028,
-            'tram': 0.029,
-            'flight_domestic': 0.255,
-            'flight_international': 0.150,
-            'taxi': 0.21,
-            'rideshare': 0.19
-        }
-    
-    def geocode_location(self, location_name: str) -> Optional[Tuple[float, float]]:
-        """Convert location name to coordinates using geocoding"""
-        # Try multiple geocoding methods in order of preference
-        
-        # Method 1: Try geopy Nominatim with SSL fix
-        coords = self._try_geopy_nominatim(location_name)
-        if coords:
-            return coords
-        
-        # Method 2: Try direct HTTP request to Nominatim (bypasses SSL issues)
-        coords = self._try_direct_nominatim(location_name)
-        if coords:
-            return coords
-        
-        # Method 3: Try alternative geocoding service (LocationIQ/OpenCage style)
-        coords = self._try_alternative_geocoding(location_name)
-        if coords:
-            return coords
-        
-        # Method 4: Try Google Maps if API key is available
-        if self.google_maps_api_key:
-            coords = self._try_google_maps(location_name)
-            if coords:
-                return coords
-        
-        # Method 5: Fallback to common locations
-        return self._fallback_geocoding(location_name)
-    
-    def _try_geopy_nominatim(self, location_name: str) -> Optional[Tuple[float, float]]:
-        """Try geocoding with geopy Nominatim"""
-        try:
-            from geopy.geocoders import Nominatim
-            import ssl
-            
-            # Create SSL context that handles certificate verification
-            try:
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-            except:
-                ssl_context = None
-            
-            # Initialize geocoder with SSL context
-            geolocator = Nominatim(
-                user_agent="carbon_footprint_tracker",
-                ssl_context=ssl_context
-            )
-            
-            # Geocode the location
-            location = geolocator.geocode(location_name, timeout=10)
-            
-            if location:
-                return (location.latitude, location.longitude)
-                
-        except Exception as e:
-            print(f"Geopy Nominatim error: {e}")
-        
-        return None
-    
-    def _try_direct_nominatim(self, location_name: str) -> Optional[Tuple[float, float]]:
-        """Try direct HTTP request to Nominatim (bypasses SSL issues)"""
-        try:
-            import urllib.parse
-            import urllib.request
-            import json
-            import ssl
-            
-            # Create SSL context that doesn't verify certificates
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            # Encode the location name for URL
-            encoded_location = urllib.parse.quote(location_name)
-            
-            # Nominatim API URL
-            url = f"https://nominatim.openstreetmap.org/search?q={encoded_location}&format=json&limit=1"
-            
-            # Create request with custom headers
-            request = urllib.request.Request(url)
-            request.add_header('User-Agent', 'carbon_footprint_tracker/1.0')
-            
-            # Make the request with SSL context
-            with urllib.request.urlopen(request, context=ssl_context, timeout=10) as response:
-                data = json.loads(response.read().decode())
-                
-                if data and len(data) > 0:
-                    result = data[0]
-                    lat = float(result['lat'])
-                    lon = float(result['lon'])
-                    return (lat, lon)
-                    
-        except Exception as e:
-            print(f"Direct Nominatim error: {e}")
-        
-        return None
-    
-    def _try_alternative_geocoding(self, location_name: str) -> Optional[Tuple[float, float]]:
-        """Try alternative geocoding using a different approach"""
-        try:
-            import urllib.parse
-            import urllib.request
-            import json
-            
-            # Use a simpler HTTP-based approach that doesn't rely on SSL
-            # This uses OpenStreetMap's Nominatim but with insecure HTTP
-            encoded_location = urllib.parse.quote(location_name)
-            
-            # Try HTTP version (less secure but works around SSL issues)
-            url = f"http://nominatim.openstreetmap.org/search?q={encoded_location}&format=json&limit=1"
-            
-            # Create request with custom headers
-            request = urllib.request.Request(url)
-            request.add_header('User-Agent', 'carbon_footprint_tracker/1.0')
-            
-            # Make the request
-            with urllib.request.urlopen(request, timeout=10) as response:
-                data = json.loads(response.read().decode())
-                
-                if data and len(data) > 0:
-                    result = data[0]
-                    lat = float(result['lat'])
-                    lon = float(result['lon'])
-                    print(f"Alternative geocoding success: {location_name} -> ({lat}, {lon})")
-                    return (lat, lon)
-                    
-        except Exception as e:
-            print(f"Alternative geocoding error: {e}")
-        
-        return None
-    
-    def _try_google_maps(self, location_name: str) -> Optional[Tuple[float, float]]:
-        """Try Google Maps Geocoding API if key is available"""
-        try:
-            import urllib.parse
-            import urllib.request
-            import json
-            
-            if not self.google_maps_api_key:
-                return None
-            
-            # Encode the location name for URL
-            encoded_location = urllib.parse.quote(location_name)
-            
-            # Google Maps Geocoding API URL
-            url = f"https://maps.googleapis.com/maps/api/geocode/json?address={encoded_location}&key={self.google_maps_api_key}"
-            
-            # Make the request
-            with urllib.request.urlopen(url, timeout=10) as response:
-                data = json.loads(response.read().decode())
-                
-                if data['status'] == 'OK' and data['results']:
-                    result = data['results'][0]
-                    location = result['geometry']['location']
-                    return (location['lat'], location['lng'])
-                    
-        except Exception as e:
-            print(f"Google Maps error: {e}")
-        
-        return None
-    
-    def _fallback_geocoding(self, location_name: str) -> Optional[Tuple[float, float]]:
-        """Fallback geocoding for common locations when main service fails"""
-        # Common locations database (latitude, longitude)
-        common_locations = {
-            # Vancouver locations
-            'robson street, vancouver': (49.2827, -123.1207),
-            'robson square, vancouver': (49.2827, -123.1207),
-            'rogers arena, vancouver': (49.2778, -123.1089),
-            'roger arena, vancouver': (49.2778, -123.1089),  # Common misspelling
-            'stanley park, vancouver': (49.3017, -123.1408),
-            'granville island, vancouver': (49.2717, -123.1351),
-            'granville street, vancouver': (49.2827, -123.1207),
-            'vancouver international airport': (49.1939, -123.1844),
-            'yvr': (49.1939, -123.1844),
-            'downtown vancouver': (49.2827, -123.1207),
-            'gastown, vancouver': (49.2839, -123.1094),
-            'chinatown, vancouver': (49.2792, -123.1013),
-            'yaletown, vancouver': (49.2745, -123.1214),
-            'kitsilano, vancouver': (49.2659, -123.1556),
-            'ubc, vancouver': (49.2606, -123.2460),
-            'burnaby': (49.2488, -122.9805),
-            'richmond, bc': (49.1666, -123.1336),
-            'surrey, bc': (49.1913, -122.8490),
-            
-            # International locations
-            'central park, new york': (40.7829, -73.9654),
-            'central park, nyc': (40.7829, -73.9654),
-            'times square, new york': (40.7580, -73.9855),
-            'times square, nyc': (40.7580, -73.9855),
-            'eiffel tower, paris': (48.8584, 2.2945),
-            'london bridge, london': (51.5081, -0.0759),
-            'sydney opera house, sydney': (-33.8568, 151.2153),
-            'statue of liberty, new york': (40.6892, -74.0445),
-            'golden gate bridge, san francisco': (37.8199, -122.4783),
-            'tokyo tower, tokyo': (35.6586, 139.7454),
-            
-            # Major cities
-            'vancouver': (49.2827, -123.1207),
-            'vancouver, bc': (49.2827, -123.1207),
-            'new york': (40.7128, -74.0060),
-            'paris': (48.8566, 2.3522),
-            'london': (51.5074, -0.1278),
-            'tokyo': (35.6762, 139.6503),
-            'sydney': (-33.8688, 151.2093),
-            'san francisco': (37.7749, -122.4194),
-            'toronto': (43.6532, -79.3832),
-            'montreal': (45.5017, -73.5673),
-            'calgary': (51.0447, -114.0719),
-            'edmonton': (53.5461, -113.4938),
-            
-            # Generic locations
-            'home': (49.2827, -123.1207),  # Default to Vancouver
-            'office': (49.2827, -123.1207),  # Default to Vancouver
-            'work': (49.2827, -123.1207),
-            'airport': (49.1939, -123.1844),  # Default to YVR
-            'downtown': (49.2827, -123.1207),
-            'mall': (49.2827, -123.1207),
-            'shopping center': (49.2827, -123.1207)
-        }
-        
-        # Normalize the location name for lookup
-        location_key = location_name.lower().strip()
-        
-        # Direct match
-        if location_key in common_locations:
-            print(f"Fallback geocoding success (direct): {location_name} -> {common_locations[location_key]}")
-            return common_locations[location_key]
-        
-        # Try partial matching for city names and landmarks
-        for key, coords in common_locations.items():
-            # Check if any word from the location matches
-            location_words = location_key.split()
-            key_words = key.split(',')[0].split()  # Take the first part before comma
-            
-            # If any significant word matches (length > 3 to avoid short words)
-            for loc_word in location_words:
-                for key_word in key_words:
-                    if len(loc_word) > 3 and len(key_word) > 3 and loc_word in key_word:
-                        print(f"Fallback geocoding success (partial): {location_name} -> {coords}")
-                        return coords
-        
-        print(f"Fallback geocoding failed: No match found for '{location_name}'")
-        return None
-    
-    def add_location_point(self, latitude: float, longitude: float, timestamp: datetime = None, accuracy: float = None) -> Dict:
-        """Add a location point to the tracking history"""
-        if timestamp is None:
-            timestamp = datetime.now()
-        
-        location_point = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'timestamp': timestamp,
-            'accuracy': accuracy or 10.0  # meters
-        }
-        
-        self.location_history.append(location_point)
-        
-        # Keep only last 1000 points to manage memory
-        if len(self.location_history) > 1000:
-            self.location_history = self.location_history[-1000:]
-        
-        return location_point
-    
-    def detect_trips(self, time_threshold_minutes: int = 5, distance_threshold_meters: int = 100) -> List[Dict]:
-        """Detect trips from location history"""
-        if len(self.location_history) < 2:
-            return []
-        
-        trips = []
-        current_trip = None
-        stationary_start = None
-        
-        sorted_history = sorted(self.location_history, key=lambda x: x['timestamp'])
-        
-        for i in range(1, len(sorted_history)):
-            prev_point = sorted_history[i-1]
-            curr_point = sorted_history[i]
-            
-            # Calculate distance and time between points
-            distance = self._calculate_distance(
-                prev_point['latitude'], prev_point['longitude'],
-                curr_point['latitude'], curr_point['longitude']
-            )
-            
-            time_diff = (curr_point['timestamp'] - prev_point['timestamp']).total_seconds() / 60  # minutes
-            
-            if distance > distance_threshold_meters:
-                # Movement detected
-                if current_trip is None:
-                    # Start new trip
-                    current_trip = {
-                        'start_point': prev_point,
-                        'end_point': curr_point,
-                        'points': [prev_point, curr_point],
-                        'total_distance': distance,
-                        'start_time': prev_point['timestamp'],
-                        'end_time': curr_point['timestamp']
-                    }
-                else:
-                    # Continue current trip
-                    current_trip['end_point'] = curr_point
-                    current_trip['points'].append(curr_point)
-                    current_trip['total_distance'] += distance
-                    current_trip['end_time'] = curr_point['timestamp']
-                
-                stationary_start = None
-            else:
-                # Stationary or slow movement
-                if stationary_start is None:
-                    stationary_start = curr_point['timestamp']
-                
-                # Check if we've been stationary long enough to end the trip
-                if current_trip and stationary_start:
-                    stationary_duration = (curr_point['timestamp'] - stationary_start).total_seconds() / 60
-                    
-                    if stationary_duration >= time_threshold_minutes:
-                        # End current trip
-                        trips.append(self._finalize_trip(current_trip))
-                        current_trip = None
-                        stationary_start = None
-        
-        # Add final trip if still ongoing
-        if current_trip:
-            trips.append(self._finalize_trip(current_trip))
-        
-        return trips
-    
-    def _finalize_trip(self, trip: Dict) -> Dict:
-        """Finalize trip with calculated metrics and transport mode detection"""
-        # Calculate total duration
-        total_duration = (trip['end_time'] - trip['start_time']).total_seconds() / 3600  # hours
-        
-        # Calculate average speed
-        distance_km = trip['total_distance'] / 1000  # Convert to km
-        avg_speed = distance_km / total_duration if total_duration > 0 else 0
-        
-        # Detect transport mode
-        transport_mode = self._detect_transport_mode(avg_speed, distance_km, trip['points'])
-        
-        # Calculate emissions
-        emission_factor = self.emission_factors.get(transport_mode, 0.21)  # Default to petrol car
-        carbon_footprint = distance_km * emission_factor
-        
-        # Add location context
-        start_location = self._get_location_context(trip['start_point'])
-        end_location = self._get_location_context(trip['end_point'])
-        
-        finalized_trip = {
-            **trip,
-            'distance_km': distance_km,
-            'duration_hours': total_duration,
-            'avg_speed_kmh': avg_speed,
-            'detected_transport_mode': transport_mode,
-            'emission_factor': emission_factor,
-            'carbon_footprint': carbon_footprint,
-            'start_location': start_location,
-            'end_location': end_location,
-            'trip_id': f"trip_{trip['start_time'].strftime('%Y%m%d_%H%M%S')}"
-        }
-        
-        return finalized_trip
-    
-    def _detect_transport_mode(self, avg_speed: float, distance_km: float, points: List[Dict]) -> str:
-        """Detect the most likely transport mode based on speed and patterns"""
-        
-        # Rule-based detection with speed thresholds
-        if avg_speed <= self.transport_thresholds['walking']['max_speed']:
-            if distance_km < 0.5:
-                return 'walking'
-            else:
-                # Could be cycling for longer distances at walking speeds
-                return 'cycling'
-        
-        elif avg_speed <= self.transport_thresholds['cycling']['max_speed']:
-            return 'cycling'
-        
-        elif avg_speed >= self.transport_thresholds['flight']['min_speed']:
-            return 'flight_domestic' if distance_km < 1000 else 'flight_international'
-        
-        else:
-            # In driving range - need to determine car vs public transport
-            # Analyze movement patterns
-            if self._is_public_transport_pattern(points, avg_speed):
-                if avg_speed < 25:
-                    return 'bus'
-                elif avg_speed < 60:
-                    return 'train'
-                else:
-                    return 'train'  # High-speed rail
-            else:
-                # Assume private vehicle
-                return 'car_petrol'  # Default assumption
-    
-    def _is_public_transport_pattern(self, points: List[Dict], avg_speed: float) -> bool:
-        """Analyze if movement pattern suggests public transport"""
-        if len(points) < 3:
-            return False
-        
-        # Public transport typically has:
-        # 1. Regular stops
-        # 2. Consistent routes
-        # 3. Specific speed patterns
-        
-        stops_detected = 0
-        speed_variations = []
-        
-        for i in range(2, len(points)):
-            prev_point = points[i-2]
-            curr_point = points[i-1]
-            next_point = points[i]
-            
-            # Calculate local speed
-            dist1 = self._calculate_distance(
-                prev_point['latitude'], prev_point['longitude'],
-                curr_point['latitude'], curr_point['longitude']
-            )
-            time1 = (curr_point['timestamp'] - prev_point['timestamp']).total_seconds() / 3600
-            speed1 = (dist1 / 1000) / time1 if time1 > 0 else 0
-            
-            dist2 = self._calculate_distance(
-                curr_point['latitude'], curr_point['longitude'],
-                next_point['latitude'], next_point['longitude']
-            )
-            time2 = (next_point['timestamp'] - curr_point['timestamp']).total_seconds() / 3600
-            speed2 = (dist2 / 1000) / time2 if time2 > 0 else 0
-            
-            # Detect stops (significant speed reduction)
-            if speed1 > 10 and speed2 < 5:
-                stops_detected += 1
-            
-            speed_variations.append(abs(speed1 - speed2))
-        
-        # Heuristics for public transport
-        avg_speed_variation = np.mean(speed_variations) if speed_variations else 0
-        stop_frequency = stops_detected / len(points) if len(points) > 0 else 0
-        
-        # Public transport tends to have more stops and speed variations
-        return stop_frequency > 0.1 or avg_speed_variation > 15
-    
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate distance between two points in meters"""
-        try:
-            return geodesic((lat1, lon1), (lat2, lon2)).meters
-        except:
-            # Fallback to haversine formula
-            return self._haversine_distance(lat1, lon1, lat2, lon2)
-    
-    def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate distance using haversine formula (fallback)"""
-        R = 6371000  # Earth's radius in meters
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_lat / 2) ** 2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
-    
-    def _get_location_context(self, point: Dict) -> Dict:
-        """Get location context using reverse geocoding"""
-        if not self.google_maps_api_key:
-            return {
-                'address': 'Unknown location',
-                'type': 'unknown',
-                'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}"
-            }
-        
-        try:
-            url = "https://maps.googleapis.com/maps/api/geocode/json"
-            params = {
-                'latlng': f"{point['latitude']},{point['longitude']}",
-                'key': self.google_maps_api_key
-            }
-            
-            response = requests.get(url, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data['results']:
-                    result = data['results'][0]
-                    address = result.get('formatted_address', 'Unknown')
-                    
-                    # Determine location type
-                    location_type = 'unknown'
-                    for component in result.get('address_components', []):
-                        types = component.get('types', [])
-                        if 'transit_station' in types:
-                            location_type = 'transit_station'
-                            break
-                        elif 'airport' in types:
-                            location_type = 'airport'
-                            break
-                        elif 'establishment' in types:
-                            location_type = 'establishment'
-                        elif 'route' in types:
-                            location_type = 'road'
-                    
-                    return {
-                        'address': address,
-                        'type': location_type,
-                        'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}",
-                        'place_id': result.get('place_id')
-                    }
-            
-            return {
-                'address': 'Geocoding failed',
-                'type': 'unknown',
-                'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}"
-            }
-            
-        except Exception as e:
-            return {
-                'address': f'Error: {str(e)}',
-                'type': 'unknown',
-                'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}"
-            }
-    
-    def get_daily_summary(self, date: datetime = None) -> Dict:
-        """Get daily transport summary for a specific date"""
-        if date is None:
-            date = datetime.now().date()
-        
-        # Filter trips for the specified date
-        trips = self.detect_trips()
-        daily_trips = [trip for trip in trips if trip['start_time'].date() == date]
-        
-        if not daily_trips:
-            return {
-                'date': date.isoformat(),
-                'total_trips': 0,
-                'total_distance_km': 0,
-                'total_emissions_kg': 0,
-                'transport_modes': {},
-                'trips': []
-            }
-        
-        # Calculate summary statistics
-        total_distance = sum(trip['distance_km'] for trip in daily_trips)
-        total_emissions = sum(trip['carbon_footprint'] for trip in daily_trips)
-        
-        # Group by transport mode
-        transport_modes = {}
-        for trip in daily_trips:
-            mode = trip['detected_transport_mode']
-            if mode not in transport_modes:
-                transport_modes[mode] = {
-                    'trip_count': 0,
-                    'total_distance_km': 0,
-                    'total_emissions_kg': 0
-                }
-            
-            transport_modes[mode]['trip_count'] += 1
-            transport_modes[mode]['total_distance_km'] += trip['distance_km']
-            transport_modes[mode]['total_emissions_kg'] += trip['carbon_footprint']
-        
-        return {
-            'date': date.isoformat(),
-            'total_trips': len(daily_trips),
-            'total_distance_km': round(total_distance, 2),
-            'total_emissions_kg': round(total_emissions, 2),
-            'transport_modes': transport_modes,
-            'trips': daily_trips
-        }
-    
-    def convert_trips_to_emission_entries(self, trips: List[Dict]) -> List[Dict]:
-        """Convert detected trips to standardized emission entries"""
-        entries = []
-        
-        for trip in trips:
-            entry = {
-                'date': trip['start_time'].isoformat(),
-                'category': 'transport',
-                'subcategory': trip['detected_transport_mode'],
-                'quantity': trip['distance_km'],
-                'unit': 'km',
-                'carbon_footprint': trip['carbon_footprint'],
-                'source': 'location_tracking',
-                'description': f"{trip['detected_transport_mode'].title()} trip from {trip['start_location']['address']} to {trip['end_location']['address']}",
-                'confidence': 'auto_detected',
-                'metadata': {
-                    'trip_id': trip['trip_id'],
-                    'duration_hours': trip['duration_hours'],
-                    'avg_speed_kmh': trip['avg_speed_kmh'],
-                    'start_location': trip['start_location'],
-                    'end_location': trip['end_location'],
-                    'detection_method': 'gps_tracking'
-                }
-            }
-            entries.append(entry)
-        
-        return entries
-    
-    def suggest_transport_mode_corrections(self, trip: Dict) -> List[Dict]:
-        """Suggest alternative transport modes for manual correction"""
-        suggestions = []
-        
-        distance_km = trip['distance_km']
-        avg_speed = trip['avg_speed_kmh']
-        
-        # Generate plausible alternatives based on distance and speed
-        if distance_km < 2:
-            suggestions.append({
-                'mode': 'walking',
-                'probability': 0.8 if avg_speed < 6 else 0.2,
-                'reason': 'Short distance, typical for walking'
-            })
-        
-        if distance_km < 10 and avg_speed < 25:
-            suggestions.append({
-                'mode': 'cycling',
-                'probability': 0.7 if 8 < avg_speed < 20 else 0.3,
-                'reason': 'Distance and speed suitable for cycling'
-            })
-        
-        if distance_km > 1:
-            suggestions.append({
-                'mode': 'car_petrol',
-                'probability': 0.6 if avg_speed > 20 else 0.3,
-                'reason': 'Most common motorized transport'
-            })
-            
-            suggestions.append({
-                'mode': 'bus',
-                'probability': 0.4 if 15 < avg_speed < 40 else 0.2,
-                'reason': 'Public transport option'
-            })
-        
-        if distance_km > 50:
-            suggestions.append({
-                'mode': 'train',
-                'probability': 0.5 if avg_speed > 40 else 0.2,
-                'reason': 'Long distance, suitable for rail'
-            })
-        
-        if distance_km > 200:
-            suggestions.append({
-                'mode': 'flight_domestic',
-                'probability': 0.7 if avg_speed > 200 else 0.1,
-                'reason': 'Very long distance, likely flight'
-            })
-        
-        # Sort by probability
-        suggestions.sort(key=lambda x: x['probability'], reverse=True)
-        
-        return suggestions[:3]  # Return top 3 suggestions
-    
-    def export_location_data(self, start_date: datetime = None, end_date: datetime = None) -> Dict:
-        """Export location tracking data for external analysis"""
-        if start_date is None:
-            start_date = datetime.now() - timedelta(days=30)
-        if end_date is None:
-            end_date = datetime.now()
-        
-        # Filter location history
-        filtered_history = [
-            point for point in self.location_history
-            if start_date <= point['timestamp'] <= end_date
-        ]
-        
-        # Detect trips
-        trips = self.detect_trips()
-        filtered_trips = [
-            trip for trip in trips
-            if start_date <= trip['start_time'] <= end_date
-        ]
-        
-        # Generate summary
-        summary = {
-            'period': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            },
-            'location_points': len(filtered_history),
-            'trips_detected': len(filtered_trips),
-            'total_distance_km': sum(trip['distance_km'] for trip in filtered_trips),
-            'total_emissions_kg': sum(trip['carbon_footprint'] for trip in filtered_trips),
-            'transport_mode_breakdown': {}
-        }
-        
-        # Calculate transport mode breakdown
-        for trip in filtered_trips:
-            mode = trip['detected_transport_mode']
-            if mode not in summary['transport_mode_breakdown']:
-                summary['transport_mode_breakdown'][mode] = {
-                    'trips': 0,
-                    'distance_km': 0,
-                    'emissions_kg': 0
-                }
-            
-            summary['transport_mode_breakdown'][mode]['trips'] += 1
-            summary['transport_mode_breakdown'][mode]['distance_km'] += trip['distance_km']
-            summary['transport_mode_breakdown'][mode]['emissions_kg'] += trip['carbon_footprint']
-        
-        return {
-            'summary': summary,
-            'location_history': filtered_history,
-            'trips': filtered_trips,
-            'emission_entries': self.convert_trips_to_emission_entries(filtered_trips)
+"""
+Location-based Carbon Tracking
+Automatically detects transport modes and calculates emissions based on location data
+"""
+
+import bisect
+import json
+import math
+import os
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, Optional
+import requests
+import numpy as np
+import pandas as pd
+
+# Optional Parquet spill for history beyond the in-memory window
+# (pandas needs a Parquet engine; fall back to memory-only without one)
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Optional numexpr backend: fuses the batch haversine into a single
+# multithreaded pass with no large intermediate arrays
+try:
+    import numexpr
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+# Below this many points the plain NumPy haversine wins (numexpr's
+# expression-compile and dispatch overhead dominates at small N)
+NUMEXPR_MIN_POINTS = 1024
+
+# Nanosecond conversion factors for raw int64 timestamp arithmetic
+NS_PER_MINUTE = 60 * 1_000_000_000
+NS_PER_HOUR = 3600 * 1_000_000_000
+
+# Common locations database for fallback geocoding (latitude, longitude)
+COMMON_LOCATIONS = {
+    # Vancouver locations
+    'robson street, vancouver': (49.2827, -123.1207),
+    'robson square, vancouver': (49.2827, -123.1207),
+    'rogers arena, vancouver': (49.2778, -123.1089),
+    'roger arena, vancouver': (49.2778, -123.1089),  # Common misspelling
+    'stanley park, vancouver': (49.3017, -123.1408),
+    'granville island, vancouver': (49.2717, -123.1351),
+    'granville street, vancouver': (49.2827, -123.1207),
+    'vancouver international airport': (49.1939, -123.1844),
+    'yvr': (49.1939, -123.1844),
+    'downtown vancouver': (49.2827, -123.1207),
+    'gastown, vancouver': (49.2839, -123.1094),
+    'chinatown, vancouver': (49.2792, -123.1013),
+    'yaletown, vancouver': (49.2745, -123.1214),
+    'kitsilano, vancouver': (49.2659, -123.1556),
+    'ubc, vancouver': (49.2606, -123.2460),
+    'burnaby': (49.2488, -122.9805),
+    'richmond, bc': (49.1666, -123.1336),
+    'surrey, bc': (49.1913, -122.8490),
+    
+    # International locations
+    'central park, new york': (40.7829, -73.9654),
+    'central park, nyc': (40.7829, -73.9654),
+    'times square, new york': (40.7580, -73.9855),
+    'times square, nyc': (40.7580, -73.9855),
+    'eiffel tower, paris': (48.8584, 2.2945),
+    'london bridge, london': (51.5081, -0.0759),
+    'sydney opera house, sydney': (-33.8568, 151.2153),
+    'statue of liberty, new york': (40.6892, -74.0445),
+    'golden gate bridge, san francisco': (37.8199, -122.4783),
+    'tokyo tower, tokyo': (35.6586, 139.7454),
+    
+    # Major cities
+    'vancouver': (49.2827, -123.1207),
+    'vancouver, bc': (49.2827, -123.1207),
+    'new york': (40.7128, -74.0060),
+    'paris': (48.8566, 2.3522),
+    'london': (51.5074, -0.1278),
+    'tokyo': (35.6762, 139.6503),
+    'sydney': (-33.8688, 151.2093),
+    'san francisco': (37.7749, -122.4194),
+    'toronto': (43.6532, -79.3832),
+    'montreal': (45.5017, -73.5673),
+    'calgary': (51.0447, -114.0719),
+    'edmonton': (53.5461, -113.4938),
+    
+    # Generic locations
+    'home': (49.2827, -123.1207),  # Default to Vancouver
+    'office': (49.2827, -123.1207),  # Default to Vancouver
+    'work': (49.2827, -123.1207),
+    'airport': (49.1939, -123.1844),  # Default to YVR
+    'downtown': (49.2827, -123.1207),
+    'mall': (49.2827, -123.1207),
+    'shopping center': (49.2827, -123.1207)
+}
+
+class LocationTracker:
+    # History is stored struct-of-arrays (parallel NumPy columns) instead of a
+    # list of per-point dicts: ~5x less memory and the hot loops read
+    # contiguous float64/int64 slices instead of chasing dict entries.
+    _INITIAL_CAPACITY = 1024
+    _MAX_POINTS = 1000
+
+    def __init__(self, google_maps_api_key: str = None, parquet_path: str = None):
+        self.google_maps_api_key = google_maps_api_key
+        # Optional directory for spilling evicted history to Parquet so
+        # exports can cover more than the in-memory window
+        self._parquet_path = parquet_path
+        self._parquet_part = 0
+        self._capacity = self._INITIAL_CAPACITY
+        self._lats = np.empty(self._capacity, dtype=np.float64)
+        self._lons = np.empty(self._capacity, dtype=np.float64)
+        self._ts_ns = np.empty(self._capacity, dtype=np.int64)
+        self._acc = np.empty(self._capacity, dtype=np.float64)
+        self._n = 0
+
+        # Build the SSL context, geocoder and HTTP session once - rebuilding
+        # them per call adds ~ms of setup and defeats TLS session reuse
+        try:
+            self._ssl_context = ssl.create_default_context()
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        except:
+            self._ssl_context = None
+
+        try:
+            from geopy.geocoders import Nominatim
+            self._nominatim = Nominatim(
+                user_agent="carbon_footprint_tracker",
+                ssl_context=self._ssl_context
+            )
+        except Exception as e:
+            print(f"Geopy Nominatim init error: {e}")
+            self._nominatim = None
+
+        # Shared HTTP session so geocoding calls reuse pooled connections
+        # instead of paying DNS + TCP + TLS handshakes per request
+        self._http_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=1)
+        self._http_session.mount('https://', adapter)
+        self._http_session.mount('http://', adapter)
+        self.transport_thresholds = {
+            'walking': {'min_speed': 0, 'max_speed': 8},      # km/h
+            'cycling': {'min_speed': 8, 'max_speed': 35},     # km/h
+            'driving': {'min_speed': 20, 'max_speed': 150},   # km/h
+            'public_transport': {'min_speed': 15, 'max_speed': 80},  # km/h
+            'flight': {'min_speed': 300, 'max_speed': 1000}   # km/h
+        }
+        
+        # Precompile the fallback-geocoding word index: each significant
+        # word (>3 chars, first comma-part of the key) maps to its coords,
+        # with a sorted word list for bisect-based prefix lookups
+        self._fallback_word_index = {}
+        for key, coords in COMMON_LOCATIONS.items():
+            for key_word in key.split(',')[0].split():
+                if len(key_word) > 3:
+                    self._fallback_word_index.setdefault(key_word, coords)
+        self._fallback_word_list = sorted(self._fallback_word_index)
+
+        # Reverse-geocoding cache keyed by rounded coordinate cell (~10 m)
+        self._revgeo_cache = {}
+
+        # detect_trips memo: results keyed by call arguments, invalidated
+        # as a whole whenever the history stamp (length, last ts) changes
+        self._trips_cache = {}
+        self._trips_stamp = None
+
+        # Sorted speed cutoffs (km/h) and parallel mode buckets so
+        # _detect_transport_mode is a binary search instead of a branch chain
+        self._mode_cutoffs_kmh = np.array([8.0, 35.0, 300.0])
+        self._mode_buckets = ('walking', 'cycling', 'motorized', 'flight')
+
+        # Emission factors for different transport modes (kg CO2 per km)
+        self.emission_factors = {
+            'walking': 0.0,
+            'cycling': 0.0,
+            'e_bike': 0.005,
+            'car_petrol': 0.21,
+            'car_diesel': 0.17,
+            'car_hybrid': 0.12,
+            'car_electric': 0.05,
+            'bus': 0.089,
+            'train': 0.041,
+            'subway': 0.028,
+            'tram': 0.029,
+            'flight_domestic': 0.255,
+            'flight_international': 0.150,
+            'taxi': 0.21,
+            'rideshare': 0.19
+        }
+    
+    def geocode_location(self, location_name: str) -> Optional[Tuple[float, float]]:
+        """Convert location name to coordinates using geocoding"""
+        # Try multiple geocoding methods in order of preference
+        
+        # Method 1: Try geopy Nominatim with SSL fix
+        coords = self._try_geopy_nominatim(location_name)
+        if coords:
+            return coords
+        
+        # Method 2: Try direct HTTP request to Nominatim (bypasses SSL issues)
+        coords = self._try_direct_nominatim(location_name)
+        if coords:
+            return coords
+        
+        # Method 3: Try alternative geocoding service (LocationIQ/OpenCage style)
+        coords = self._try_alternative_geocoding(location_name)
+        if coords:
+            return coords
+        
+        # Method 4: Try Google Maps if API key is available
+        if self.google_maps_api_key:
+            coords = self._try_google_maps(location_name)
+            if coords:
+                return coords
+        
+        # Method 5: Fallback to common locations
+        return self._fallback_geocoding(location_name)
+    
+    def _try_geopy_nominatim(self, location_name: str) -> Optional[Tuple[float, float]]:
+        """Try geocoding with the shared geopy Nominatim geocoder"""
+        if self._nominatim is None:
+            return None
+
+        try:
+            # Geocode the location with the geocoder built in __init__
+            location = self._nominatim.geocode(location_name, timeout=10)
+
+            if location:
+                return (location.latitude, location.longitude)
+
+        except Exception as e:
+            print(f"Geopy Nominatim error: {e}")
+
+        return None
+    
+    def _try_direct_nominatim(self, location_name: str) -> Optional[Tuple[float, float]]:
+        """Try direct HTTP request to Nominatim (bypasses SSL issues)"""
+        try:
+            # Use the shared session so the connection is reused across calls
+            response = self._http_session.get(
+                "https://nominatim.openstreetmap.org/search",
+                params={'q': location_name, 'format': 'json', 'limit': 1},
+                headers={'User-Agent': 'carbon_footprint_tracker/1.0'},
+                timeout=10,
+                verify=False
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+
+                if data and len(data) > 0:
+                    result = data[0]
+                    lat = float(result['lat'])
+                    lon = float(result['lon'])
+                    return (lat, lon)
+
+        except Exception as e:
+            print(f"Direct Nominatim error: {e}")
+
+        return None
+
+    def _try_alternative_geocoding(self, location_name: str) -> Optional[Tuple[float, float]]:
+        """Try alternative geocoding using a different approach"""
+        try:
+            # HTTP version of Nominatim (less secure but works around SSL
+            # issues), still on the shared keep-alive session
+            response = self._http_session.get(
+                "http://nominatim.openstreetmap.org/search",
+                params={'q': location_name, 'format': 'json', 'limit': 1},
+                headers={'User-Agent': 'carbon_footprint_tracker/1.0'},
+                timeout=10
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+
+                if data and len(data) > 0:
+                    result = data[0]
+                    lat = float(result['lat'])
+                    lon = float(result['lon'])
+                    print(f"Alternative geocoding success: {location_name} -> ({lat}, {lon})")
+                    return (lat, lon)
+
+        except Exception as e:
+            print(f"Alternative geocoding error: {e}")
+
+        return None
+
+    def _try_google_maps(self, location_name: str) -> Optional[Tuple[float, float]]:
+        """Try Google Maps Geocoding API if key is available"""
+        try:
+            if not self.google_maps_api_key:
+                return None
+
+            response = self._http_session.get(
+                "https://maps.googleapis.com/maps/api/geocode/json",
+                params={'address': location_name, 'key': self.google_maps_api_key},
+                timeout=10
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+
+                if data['status'] == 'OK' and data['results']:
+                    result = data['results'][0]
+                    location = result['geometry']['location']
+                    return (location['lat'], location['lng'])
+
+        except Exception as e:
+            print(f"Google Maps error: {e}")
+
+        return None
+    
+    def _fallback_geocoding(self, location_name: str) -> Optional[Tuple[float, float]]:
+        """Fallback geocoding for common locations when main service fails"""
+        # Normalize the location name for lookup
+        location_key = location_name.lower().strip()
+
+        # Direct match
+        if location_key in COMMON_LOCATIONS:
+            print(f"Fallback geocoding success (direct): {location_name} -> {COMMON_LOCATIONS[location_key]}")
+            return COMMON_LOCATIONS[location_key]
+
+        # Partial matching via the word index precompiled in __init__: exact
+        # word hit first, then prefix search over the sorted word list
+        # (bisect stands in for a trie without a new dependency) - O(log W)
+        # per query word instead of rescanning every key's words
+        for loc_word in location_key.split():
+            if len(loc_word) <= 3:  # skip short words
+                continue
+
+            coords = self._fallback_word_index.get(loc_word)
+            if coords is None:
+                i = bisect.bisect_left(self._fallback_word_list, loc_word)
+                if i < len(self._fallback_word_list) and self._fallback_word_list[i].startswith(loc_word):
+                    coords = self._fallback_word_index[self._fallback_word_list[i]]
+
+            if coords is not None:
+                print(f"Fallback geocoding success (partial): {location_name} -> {coords}")
+                return coords
+
+        print(f"Fallback geocoding failed: No match found for '{location_name}'")
+        return None
+    
+    @property
+    def location_history(self) -> List[Dict]:
+        """Dict view of the history for callers that need point records"""
+        return [self._point(i) for i in range(self._n)]
+
+    def _point(self, index: int) -> Dict:
+        """Materialize a single history point as a dict (lazy AoS view)"""
+        return {
+            'latitude': float(self._lats[index]),
+            'longitude': float(self._lons[index]),
+            'timestamp': datetime.fromtimestamp(self._ts_ns[index] * 1e-9),
+            'accuracy': float(self._acc[index])
+        }
+
+    def _grow_capacity(self):
+        """Double the capacity of the history arrays"""
+        self._capacity *= 2
+        for name in ('_lats', '_lons', '_ts_ns', '_acc'):
+            old = getattr(self, name)
+            new = np.empty(self._capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def add_location_point(self, latitude: float, longitude: float, timestamp: datetime = None, accuracy: float = None) -> Dict:
+        """Add a location point to the tracking history"""
+        if timestamp is None:
+            timestamp = datetime.now()
+
+        if self._n == self._capacity:
+            self._grow_capacity()
+
+        self._lats[self._n] = latitude
+        self._lons[self._n] = longitude
+        self._ts_ns[self._n] = int(timestamp.timestamp() * 1e9)
+        self._acc[self._n] = accuracy or 10.0  # meters
+        self._n += 1
+
+        # Keep only last 1000 points to manage memory (slide the window in
+        # place, spilling the evicted rows to Parquet when configured)
+        if self._n > self._MAX_POINTS:
+            start = self._n - self._MAX_POINTS
+            self._spill_to_parquet(0, start)
+            for arr in (self._lats, self._lons, self._ts_ns, self._acc):
+                arr[:self._MAX_POINTS] = arr[start:self._n]
+            self._n = self._MAX_POINTS
+
+        return self._point(self._n - 1)
+
+    def _spill_to_parquet(self, start: int, stop: int):
+        """Write evicted history rows [start, stop) to a Parquet part file"""
+        if not (self._parquet_path and PARQUET_AVAILABLE) or stop <= start:
+            return
+
+        try:
+            os.makedirs(self._parquet_path, exist_ok=True)
+            part = pd.DataFrame({
+                'latitude': self._lats[start:stop],
+                'longitude': self._lons[start:stop],
+                'ts_ns': self._ts_ns[start:stop],
+                'accuracy': self._acc[start:stop]
+            })
+            part.to_parquet(
+                os.path.join(self._parquet_path, f"points_{self._parquet_part:06d}.parquet"),
+                compression='snappy'
+            )
+            self._parquet_part += 1
+        except Exception as e:
+            print(f"Parquet spill error: {e}")
+
+    def _scan_parquet_window(self, start_ns: int, end_ns: int) -> List[Dict]:
+        """Read spilled points inside [start_ns, end_ns] from the Parquet parts"""
+        if not (self._parquet_path and PARQUET_AVAILABLE) or not os.path.isdir(self._parquet_path):
+            return []
+
+        points = []
+        try:
+            for fname in sorted(os.listdir(self._parquet_path)):
+                if not fname.endswith('.parquet'):
+                    continue
+                # Row-group predicate pushdown: only in-window rows are read
+                part = pd.read_parquet(
+                    os.path.join(self._parquet_path, fname),
+                    filters=[('ts_ns', '>=', start_ns), ('ts_ns', '<=', end_ns)]
+                )
+                for row in part.itertuples(index=False):
+                    points.append({
+                        'latitude': float(row.latitude),
+                        'longitude': float(row.longitude),
+                        'timestamp': datetime.fromtimestamp(row.ts_ns * 1e-9),
+                        'accuracy': float(row.accuracy)
+                    })
+        except Exception as e:
+            print(f"Parquet scan error: {e}")
+
+        return points
+    
+    def detect_trips(self, time_threshold_minutes: int = 5, distance_threshold_meters: int = 100,
+                     start_ts: datetime = None, end_ts: datetime = None) -> List[Dict]:
+        """Detect trips from location history, optionally bounded to a time window"""
+        if self._n < 2:
+            return []
+
+        # Serve repeat queries over unchanged history from the memo
+        stamp = (self._n, int(self._ts_ns[self._n - 1]))
+        if stamp != self._trips_stamp:
+            self._trips_cache.clear()
+            self._trips_stamp = stamp
+
+        cache_key = (time_threshold_minutes, distance_threshold_meters,
+                     None if start_ts is None else start_ts.timestamp(),
+                     None if end_ts is None else end_ts.timestamp())
+        cached = self._trips_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        trips = []
+        current_trip = None
+        stationary_start_ns = None
+
+        # Read the SoA columns directly and sort once by timestamp; time math
+        # runs on the raw int64 nanoseconds so no timedelta is allocated
+        order = np.argsort(self._ts_ns[:self._n], kind='stable')
+        ts_ns = self._ts_ns[order]
+
+        # Narrow to the requested window with binary search so per-day
+        # queries only segment that slice instead of the full history
+        lo, hi = 0, len(ts_ns)
+        if start_ts is not None:
+            lo = int(np.searchsorted(ts_ns, int(start_ts.timestamp() * 1e9), side='left'))
+        if end_ts is not None:
+            hi = int(np.searchsorted(ts_ns, int(end_ts.timestamp() * 1e9), side='right'))
+        if hi - lo < 2:
+            return []
+        order = order[lo:hi]
+        ts_ns = ts_ns[lo:hi]
+
+        sorted_history = [self._point(i) for i in order]
+
+        # Trip membership is recorded as indexed writes into one
+        # preallocated int32 buffer instead of per-trip list appends; each
+        # trip keeps its [start, end) window into this buffer
+        point_idx = np.empty(len(sorted_history), dtype=np.int32)
+        tip = 0
+
+        def _close_trip(trip):
+            trip['points'] = [sorted_history[k] for k in point_idx[trip.pop('_idx_start'):tip]]
+            trips.append(trip)
+
+        for i in range(1, len(sorted_history)):
+            prev_point = sorted_history[i-1]
+            curr_point = sorted_history[i]
+
+            # Calculate distance between points
+            distance = self._calculate_distance(
+                prev_point['latitude'], prev_point['longitude'],
+                curr_point['latitude'], curr_point['longitude']
+            )
+
+            if distance > distance_threshold_meters:
+                # Movement detected
+                if current_trip is None:
+                    # Start new trip
+                    current_trip = {
+                        'start_point': prev_point,
+                        'end_point': curr_point,
+                        'total_distance': distance,
+                        'start_ts_ns': int(ts_ns[i-1]),
+                        'end_ts_ns': int(ts_ns[i]),
+                        '_idx_start': tip
+                    }
+                    point_idx[tip] = i - 1
+                    point_idx[tip + 1] = i
+                    tip += 2
+                else:
+                    # Continue current trip
+                    current_trip['end_point'] = curr_point
+                    current_trip['total_distance'] += distance
+                    current_trip['end_ts_ns'] = int(ts_ns[i])
+                    point_idx[tip] = i
+                    tip += 1
+
+                stationary_start_ns = None
+            else:
+                # Stationary or slow movement
+                if stationary_start_ns is None:
+                    stationary_start_ns = int(ts_ns[i])
+
+                # Check if we've been stationary long enough to end the trip
+                if current_trip and stationary_start_ns:
+                    stationary_duration = (int(ts_ns[i]) - stationary_start_ns) / NS_PER_MINUTE
+
+                    if stationary_duration >= time_threshold_minutes:
+                        # End current trip
+                        _close_trip(current_trip)
+                        current_trip = None
+                        stationary_start_ns = None
+
+        # Add final trip if still ongoing
+        if current_trip:
+            _close_trip(current_trip)
+
+        # Resolve location context for all trip endpoints in one concurrent
+        # batch instead of two serial HTTP round-trips per trip
+        endpoints = [trip['start_point'] for trip in trips] + [trip['end_point'] for trip in trips]
+        context_map = self._batch_reverse_geocode(endpoints)
+
+        finalized = [self._finalize_trip(trip, context_map) for trip in trips]
+        self._trips_cache[cache_key] = finalized
+        return finalized
+
+    @staticmethod
+    def _coord_key(point: Dict) -> Tuple[float, float]:
+        """Cache key for a point, rounded to ~10 m so nearby points coalesce"""
+        return (round(point['latitude'], 4), round(point['longitude'], 4))
+
+    def _batch_reverse_geocode(self, points: List[Dict]) -> Dict[Tuple[float, float], Dict]:
+        """Reverse-geocode a batch of points concurrently, deduplicated by rounded coords"""
+        unique_points = {}
+        for point in points:
+            unique_points.setdefault(self._coord_key(point), point)
+
+        if not unique_points:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            contexts = executor.map(self._get_location_context, unique_points.values())
+
+        return dict(zip(unique_points.keys(), contexts))
+
+    def _finalize_trip(self, trip: Dict, context_map: Dict = None) -> Dict:
+        """Finalize trip with calculated metrics and transport mode detection"""
+        # Calculate total duration from the raw nanosecond stamps; datetimes
+        # are only materialized below for the API surface
+        start_ts_ns = trip.pop('start_ts_ns')
+        end_ts_ns = trip.pop('end_ts_ns')
+        total_duration = (end_ts_ns - start_ts_ns) / NS_PER_HOUR  # hours
+
+        # Calculate average speed
+        distance_km = trip['total_distance'] / 1000  # Convert to km
+        avg_speed = distance_km / total_duration if total_duration > 0 else 0
+        
+        # Detect transport mode
+        transport_mode = self._detect_transport_mode(avg_speed, distance_km, trip['points'])
+        
+        # Calculate emissions
+        emission_factor = self.emission_factors.get(transport_mode, 0.21)  # Default to petrol car
+        carbon_footprint = distance_km * emission_factor
+        
+        # Add location context (from the batch-resolved map when available)
+        if context_map is not None:
+            start_location = context_map[self._coord_key(trip['start_point'])]
+            end_location = context_map[self._coord_key(trip['end_point'])]
+        else:
+            start_location = self._get_location_context(trip['start_point'])
+            end_location = self._get_location_context(trip['end_point'])
+        
+        start_time = datetime.fromtimestamp(start_ts_ns * 1e-9)
+
+        finalized_trip = {
+            **trip,
+            'start_time': start_time,
+            'end_time': datetime.fromtimestamp(end_ts_ns * 1e-9),
+            'distance_km': distance_km,
+            'duration_hours': total_duration,
+            'avg_speed_kmh': avg_speed,
+            'detected_transport_mode': transport_mode,
+            'emission_factor': emission_factor,
+            'carbon_footprint': carbon_footprint,
+            'start_location': start_location,
+            'end_location': end_location,
+            'trip_id': f"trip_{start_time.strftime('%Y%m%d_%H%M%S')}"
+        }
+
+        return finalized_trip
+    
+    def _detect_transport_mode(self, avg_speed: float, distance_km: float, points: List[Dict]) -> str:
+        """Detect the most likely transport mode based on speed and patterns"""
+
+        # O(log K) bucket lookup on the precomputed cutoffs, then the same
+        # distance/pattern refinements the branch chain applied
+        bucket = self._mode_buckets[int(np.searchsorted(self._mode_cutoffs_kmh, avg_speed, side='left'))]
+        if bucket == 'motorized' and avg_speed >= self.transport_thresholds['flight']['min_speed']:
+            bucket = 'flight'  # exactly at the flight cutoff
+
+        if bucket == 'walking':
+            # Could be cycling for longer distances at walking speeds
+            return 'walking' if distance_km < 0.5 else 'cycling'
+
+        if bucket == 'cycling':
+            return 'cycling'
+
+        if bucket == 'flight':
+            return 'flight_domestic' if distance_km < 1000 else 'flight_international'
+
+        # In driving range - need to determine car vs public transport
+        # Analyze movement patterns
+        if self._is_public_transport_pattern(points, avg_speed):
+            return 'bus' if avg_speed < 25 else 'train'  # train covers high-speed rail
+        else:
+            # Assume private vehicle
+            return 'car_petrol'  # Default assumption
+    
+    def _is_public_transport_pattern(self, points: List[Dict], avg_speed: float) -> bool:
+        """Analyze if movement pattern suggests public transport"""
+        if len(points) < 3:
+            return False
+        
+        # Public transport typically has:
+        # 1. Regular stops
+        # 2. Consistent routes
+        # 3. Specific speed patterns
+
+        # One fused NumPy pass: each adjacent segment's distance, time and
+        # speed is computed exactly once (the loop version recomputed the
+        # i->i+1 distance as the next iteration's i-1->i distance)
+        lats = np.array([p['latitude'] for p in points])
+        lons = np.array([p['longitude'] for p in points])
+        ts_s = np.array([p['timestamp'].timestamp() for p in points])
+
+        dist = self._haversine_vec(lats[:-1], lons[:-1], lats[1:], lons[1:])  # meters
+        dt = np.diff(ts_s) / 3600  # hours
+        speed = (dist / 1000) / np.where(dt > 0, dt, np.inf)  # km/h
+
+        # Detect stops (significant speed reduction between segments)
+        stops_detected = int(np.sum((speed[:-1] > 10) & (speed[1:] < 5)))
+
+        # Heuristics for public transport
+        avg_speed_variation = float(np.mean(np.abs(np.diff(speed)))) if speed.size > 1 else 0
+        stop_frequency = stops_detected / len(points)
+
+        # Public transport tends to have more stops and speed variations
+        return stop_frequency > 0.1 or avg_speed_variation > 15
+    
+    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """Calculate distance between two points in meters"""
+        # Haversine is within 0.5% of the geodesic result, which is plenty for
+        # speed classification, and orders of magnitude faster than geopy's
+        # iterative pure-Python geodesic solver
+        return self._haversine_distance(lat1, lon1, lat2, lon2)
+
+    @staticmethod
+    def _haversine_vec(lat1: np.ndarray, lon1: np.ndarray,
+                       lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+        """Vectorized haversine distance in meters over coordinate arrays (degrees)"""
+        if NUMEXPR_AVAILABLE and np.size(lat1) > NUMEXPR_MIN_POINTS:
+            deg2rad = math.pi / 180.0
+            return numexpr.evaluate(
+                "2 * 6371000 * arcsin(sqrt("
+                "sin((lat2 - lat1) * deg2rad / 2) ** 2 + "
+                "cos(lat1 * deg2rad) * cos(lat2 * deg2rad) * "
+                "sin((lon2 - lon1) * deg2rad / 2) ** 2))",
+                local_dict={'lat1': lat1, 'lon1': lon1,
+                            'lat2': lat2, 'lon2': lon2,
+                            'deg2rad': deg2rad}
+            )
+
+        lat1_rad = np.radians(lat1)
+        lat2_rad = np.radians(lat2)
+        delta_lat = np.radians(lat2 - lat1)
+        delta_lon = np.radians(lon2 - lon1)
+
+        a = (np.sin(delta_lat / 2) ** 2 +
+             np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2)
+
+        return 2 * 6371000 * np.arcsin(np.sqrt(a))
+
+
+    def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """Calculate distance using haversine formula (fallback)"""
+        R = 6371000  # Earth's radius in meters
+        
+        lat1_rad = math.radians(lat1)
+        lat2_rad = math.radians(lat2)
+        delta_lat = math.radians(lat2 - lat1)
+        delta_lon = math.radians(lon2 - lon1)
+        
+        a = (math.sin(delta_lat / 2) ** 2 + 
+             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2)
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        
+        return R * c
+    
+    def _get_location_context(self, point: Dict) -> Dict:
+        """Get location context using reverse geocoding"""
+        if not self.google_maps_api_key:
+            return {
+                'address': 'Unknown location',
+                'type': 'unknown',
+                'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}"
+            }
+        
+        # Most trips start/end at a handful of repeated places (home, work,
+        # gym); serve repeats within the same ~10 m cell from the cache
+        cache_key = self._coord_key(point)
+        cached = self._revgeo_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            url = "https://maps.googleapis.com/maps/api/geocode/json"
+            params = {
+                'latlng': f"{point['latitude']},{point['longitude']}",
+                'key': self.google_maps_api_key
+            }
+
+            response = self._http_session.get(url, params=params, timeout=5)
+            
+            if response.status_code == 200:
+                data = response.json()
+                
+                if data['results']:
+                    result = data['results'][0]
+                    address = result.get('formatted_address', 'Unknown')
+                    
+                    # Determine location type
+                    location_type = 'unknown'
+                    for component in result.get('address_components', []):
+                        types = component.get('types', [])
+                        if 'transit_station' in types:
+                            location_type = 'transit_station'
+                            break
+                        elif 'airport' in types:
+                            location_type = 'airport'
+                            break
+                        elif 'establishment' in types:
+                            location_type = 'establishment'
+                        elif 'route' in types:
+                            location_type = 'road'
+                    
+                    context = {
+                        'address': address,
+                        'type': location_type,
+                        'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}",
+                        'place_id': result.get('place_id')
+                    }
+                    # Only cache successful lookups so transient failures retry
+                    self._revgeo_cache[cache_key] = context
+                    return context
+            
+            return {
+                'address': 'Geocoding failed',
+                'type': 'unknown',
+                'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}"
+            }
+            
+        except Exception as e:
+            return {
+                'address': f'Error: {str(e)}',
+                'type': 'unknown',
+                'coordinates': f"{point['latitude']:.6f}, {point['longitude']:.6f}"
+            }
+    
+    def get_daily_summary(self, date: datetime = None) -> Dict:
+        """Get daily transport summary for a specific date"""
+        if date is None:
+            date = datetime.now().date()
+
+        # Only segment the day's slice of history (padded 30 min each side
+        # for trips crossing midnight) rather than the full history
+        day_start = datetime.combine(date, datetime.min.time())
+        pad = timedelta(minutes=30)
+        trips = self.detect_trips(start_ts=day_start - pad,
+                                  end_ts=day_start + timedelta(days=1) + pad)
+        daily_trips = [trip for trip in trips if trip['start_time'].date() == date]
+        
+        if not daily_trips:
+            return {
+                'date': date.isoformat(),
+                'total_trips': 0,
+                'total_distance_km': 0,
+                'total_emissions_kg': 0,
+                'transport_modes': {},
+                'trips': []
+            }
+        
+        # Totals and the mode breakdown come from the same daily_trips
+        # list returned below, so the payload is always self-consistent
+        # regardless of how other callers have windowed detect_trips
+        transport_modes = {}
+        total_distance = 0.0
+        total_emissions = 0.0
+        for trip in daily_trips:
+            stats = transport_modes.setdefault(trip['detected_transport_mode'], {
+                'trip_count': 0,
+                'total_distance_km': 0,
+                'total_emissions_kg': 0
+            })
+            stats['trip_count'] += 1
+            stats['total_distance_km'] += trip['distance_km']
+            stats['total_emissions_kg'] += trip['carbon_footprint']
+            total_distance += trip['distance_km']
+            total_emissions += trip['carbon_footprint']
+
+        return {
+            'date': date.isoformat(),
+            'total_trips': len(daily_trips),
+            'total_distance_km': round(total_distance, 2),
+            'total_emissions_kg': round(total_emissions, 2),
+            'transport_modes': transport_modes,
+            'trips': daily_trips
+        }
+    
+    def convert_trips_to_emission_entries(self, trips: List[Dict]) -> List[Dict]:
+        """Convert detected trips to standardized emission entries"""
+        entries = []
+        
+        for trip in trips:
+            entry = {
+                'date': trip['start_time'].isoformat(),
+                'category': 'transport',
+                'subcategory': trip['detected_transport_mode'],
+                'quantity': trip['distance_km'],
+                'unit': 'km',
+                'carbon_footprint': trip['carbon_footprint'],
+                'source': 'location_tracking',
+                'description': f"{trip['detected_transport_mode'].title()} trip from {trip['start_location']['address']} to {trip['end_location']['address']}",
+                'confidence': 'auto_detected',
+                'metadata': {
+                    'trip_id': trip['trip_id'],
+                    'duration_hours': trip['duration_hours'],
+                    'avg_speed_kmh': trip['avg_speed_kmh'],
+                    'start_location': trip['start_location'],
+                    'end_location': trip['end_location'],
+                    'detection_method': 'gps_tracking'
+                }
+            }
+            entries.append(entry)
+        
+        return entries
+    
+    def suggest_transport_mode_corrections(self, trip: Dict) -> List[Dict]:
+        """Suggest alternative transport modes for manual correction"""
+        suggestions = []
+        
+        distance_km = trip['distance_km']
+        avg_speed = trip['avg_speed_kmh']
+        
+        # Generate plausible alternatives based on distance and speed
+        if distance_km < 2:
+            suggestions.append({
+                'mode': 'walking',
+                'probability': 0.8 if avg_speed < 6 else 0.2,
+                'reason': 'Short distance, typical for walking'
+            })
+        
+        if distance_km < 10 and avg_speed < 25:
+            suggestions.append({
+                'mode': 'cycling',
+                'probability': 0.7 if 8 < avg_speed < 20 else 0.3,
+                'reason': 'Distance and speed suitable for cycling'
+            })
+        
+        if distance_km > 1:
+            suggestions.append({
+                'mode': 'car_petrol',
+                'probability': 0.6 if avg_speed > 20 else 0.3,
+                'reason': 'Most common motorized transport'
+            })
+            
+            suggestions.append({
+                'mode': 'bus',
+                'probability': 0.4 if 15 < avg_speed < 40 else 0.2,
+                'reason': 'Public transport option'
+            })
+        
+        if distance_km > 50:
+            suggestions.append({
+                'mode': 'train',
+                'probability': 0.5 if avg_speed > 40 else 0.2,
+                'reason': 'Long distance, suitable for rail'
+            })
+        
+        if distance_km > 200:
+            suggestions.append({
+                'mode': 'flight_domestic',
+                'probability': 0.7 if avg_speed > 200 else 0.1,
+                'reason': 'Very long distance, likely flight'
+            })
+        
+        # Sort by probability (itemgetter is C-implemented, unlike a lambda)
+        suggestions.sort(key=itemgetter('probability'), reverse=True)
+        
+        return suggestions[:3]  # Return top 3 suggestions
+    
+    def export_location_data(self, start_date: datetime = None, end_date: datetime = None) -> Dict:
+        """Export location tracking data for external analysis"""
+        if start_date is None:
+            start_date = datetime.now() - timedelta(days=30)
+        if end_date is None:
+            end_date = datetime.now()
+        
+        # Filter location history with one vectorized mask over the int64
+        # timestamp column instead of N Python datetime comparisons; only
+        # the in-window points are materialized as dicts
+        ts_ns = self._ts_ns[:self._n]
+        start_ns = int(start_date.timestamp() * 1e9)
+        end_ns = int(end_date.timestamp() * 1e9)
+        in_window = np.nonzero((ts_ns >= start_ns) & (ts_ns <= end_ns))[0]
+        filtered_history = self._scan_parquet_window(start_ns, end_ns) + \
+            [self._point(int(i)) for i in in_window]
+        
+        # Detect trips and filter them by a columnar start-time mask, same
+        # as the history window above
+        trips = self.detect_trips()
+        if trips:
+            starts_ns = np.array([int(trip['start_time'].timestamp() * 1e9) for trip in trips],
+                                 dtype=np.int64)
+            keep = np.nonzero((starts_ns >= start_ns) & (starts_ns <= end_ns))[0]
+            filtered_trips = [trips[int(i)] for i in keep]
+        else:
+            filtered_trips = []
+        
+        # Totals and per-mode breakdown as one vectorized groupby over a
+        # trips frame instead of generator passes plus a dict-of-dicts loop
+        total_distance = 0.0
+        total_emissions = 0.0
+        mode_breakdown = {}
+        if filtered_trips:
+            trips_df = pd.DataFrame(filtered_trips,
+                                    columns=['detected_transport_mode', 'distance_km', 'carbon_footprint'])
+            totals = trips_df[['distance_km', 'carbon_footprint']].sum()
+            total_distance = float(totals['distance_km'])
+            total_emissions = float(totals['carbon_footprint'])
+            mode_breakdown = trips_df.groupby('detected_transport_mode', sort=False).agg(
+                trips=('distance_km', 'size'),
+                distance_km=('distance_km', 'sum'),
+                emissions_kg=('carbon_footprint', 'sum')
+            ).to_dict(orient='index')
+
+        # Generate summary
+        summary = {
+            'period': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            },
+            'location_points': len(filtered_history),
+            'trips_detected': len(filtered_trips),
+            'total_distance_km': total_distance,
+            'total_emissions_kg': total_emissions,
+            'transport_mode_breakdown': mode_breakdown
+        }
+
+        return {
+            'summary': summary,
+            'location_history': filtered_history,
+            'trips': filtered_trips,
+            'emission_entries': self.convert_trips_to_emission_entries(filtered_trips)
         } 
\ No newline at end of file
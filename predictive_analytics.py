@@ -1,437 +1,678 @@
-"""
-Predictive Analytics Engine for Carbon Footprint Calculator
-Uses machine learning to forecast future emissions and provide insights
-"""
-
-import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, r2_score
-from datetime import datetime, timedelta
-import json
-from typing import Dict, List, Tuple, Optional
-import warnings
-warnings.filterwarnings('ignore')
-
-class PredictiveAnalytics:
-    def __init__(self):
-        self.models = {
-            'linear': LinearRegression(),
-            'forest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'gradient_boost': GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
-        }
-        self.scalers = {
-            'linear': StandardScaler(),
-            'forest': StandardScaler(),
-            'gradient_boost': StandardScaler()
-        }
-        self.is_trained = {
-            'linear': False,
-            'forest': False,
-            'gradient_boost': False
-        }
-        self.feature_importance = {}
-    
-    def get_model_info(self) -> Dict[str, Dict]:
-        """Get information about available models"""
-        return {
-            'linear': {
-                'name': 'Linear Regression',
-                'description': 'Simple linear relationship model, fast and interpretable',
-                'best_for': 'Linear trends and patterns',
-                'complexity': 'Low'
-            },
-            'forest': {
-                'name': 'Random Forest',
-                'description': 'Ensemble of decision trees, handles non-linear patterns well',
-                'best_for': 'Complex patterns and feature interactions',
-                'complexity': 'Medium'
-            },
-            'gradient_boost': {
-                'name': 'Gradient Boosting',
-                'description': 'Sequential ensemble method, often provides highest accuracy',
-                'best_for': 'High accuracy predictions with complex data',
-                'complexity': 'High'
-            }
-        }
-    
-    def get_trained_models(self) -> List[str]:
-        """Get list of successfully trained models"""
-        return [model for model, trained in self.is_trained.items() if trained]
-        
-    def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Prepare features for machine learning models"""
-        if df.empty:
-            return df
-            
-        # Convert date to datetime if it's not already
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # Extract temporal features
-            df['day_of_week'] = df['date'].dt.dayofweek
-            df['month'] = df['date'].dt.month
-            df['day_of_year'] = df['date'].dt.dayofyear
-            df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-            
-        # Create category-based features
-        categories = ['transport', 'food', 'appliances', 'entertainment', 'other']
-        for category in categories:
-            df[f'{category}_emissions'] = 0.0
-            
-        # Aggregate emissions by category
-        if 'category' in df.columns and 'carbon_footprint' in df.columns:
-            for idx, row in df.iterrows():
-                category = row['category'].lower()
-                if category in categories:
-                    df.at[idx, f'{category}_emissions'] = row['carbon_footprint']
-        
-        # Rolling averages (7-day and 30-day)
-        if len(df) > 1:
-            df = df.sort_values('date')
-            df['rolling_7d_avg'] = df['carbon_footprint'].rolling(window=7, min_periods=1).mean()
-            df['rolling_30d_avg'] = df['carbon_footprint'].rolling(window=30, min_periods=1).mean()
-            
-            # Trend indicators
-            df['trend_7d'] = df['carbon_footprint'] - df['rolling_7d_avg']
-            df['emissions_volatility'] = df['carbon_footprint'].rolling(window=7, min_periods=1).std()
-        else:
-            df['rolling_7d_avg'] = df['carbon_footprint']
-            df['rolling_30d_avg'] = df['carbon_footprint']
-            df['trend_7d'] = 0
-            df['emissions_volatility'] = 0
-            
-        return df
-    
-    def train_models(self, df: pd.DataFrame) -> Dict[str, float]:
-        """Train predictive models on historical data"""
-        if len(df) < 10:  # Need minimum data for training
-            return {"error": "Insufficient data for training (minimum 10 entries required)"}
-        
-        # Prepare features
-        df_features = self.prepare_features(df.copy())
-        
-        # Select feature columns
-        feature_columns = [
-            'day_of_week', 'month', 'day_of_year', 'is_weekend',
-            'transport_emissions', 'food_emissions', 'appliances_emissions', 
-            'entertainment_emissions', 'other_emissions',
-            'rolling_7d_avg', 'rolling_30d_avg', 'trend_7d', 'emissions_volatility'
-        ]
-        
-        # Ensure all feature columns exist
-        for col in feature_columns:
-            if col not in df_features.columns:
-                df_features[col] = 0
-        
-        X = df_features[feature_columns].fillna(0)
-        y = df_features['carbon_footprint'].fillna(0)
-        
-        if len(X) < 5:
-            return {"error": "Insufficient data for model training"}
-        
-        # Split data
-        if len(X) > 20:
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        else:
-            X_train, X_test, y_train, y_test = X, X, y, y
-        
-        results = {}
-        
-        # Train models
-        for model_name, model in self.models.items():
-            try:
-                # Scale features
-                X_train_scaled = self.scalers[model_name].fit_transform(X_train)
-                X_test_scaled = self.scalers[model_name].transform(X_test)
-                
-                # Train model
-                model.fit(X_train_scaled, y_train)
-                
-                # Evaluate
-                y_pred = model.predict(X_test_scaled)
-                mae = mean_absolute_error(y_test, y_pred)
-                r2 = r2_score(y_test, y_pred)
-                
-                results[model_name] = {
-                    'mae': mae,
-                    'r2_score': r2,
-                    'trained': True
-                }
-                
-                self.is_trained[model_name] = True
-                
-                # Store feature importance for Random Forest
-                if model_name == 'forest':
-                    importance = dict(zip(feature_columns, model.feature_importances_))
-                    self.feature_importance = importance
-                    
-            except Exception as e:
-                results[model_name] = {'error': str(e), 'trained': False}
-        
-        return results
-    
-    def predict_future_emissions(self, df: pd.DataFrame, days_ahead: int = 30) -> Dict:
-        """Predict future emissions for specified number of days"""
-        if not any(self.is_trained.values()):
-            return {"error": "Models not trained yet. Please train models first."}
-        
-        if df.empty:
-            return {"error": "No historical data available for prediction"}
-        
-        # Prepare base data
-        df_prepared = self.prepare_features(df.copy())
-        latest_date = pd.to_datetime(df_prepared['date']).max()
-        
-        # Generate future dates
-        future_dates = [latest_date + timedelta(days=i+1) for i in range(days_ahead)]
-        
-        # Create feature columns for future predictions
-        feature_columns = [
-            'day_of_week', 'month', 'day_of_year', 'is_weekend',
-            'transport_emissions', 'food_emissions', 'appliances_emissions', 
-            'entertainment_emissions', 'other_emissions',
-            'rolling_7d_avg', 'rolling_30d_avg', 'trend_7d', 'emissions_volatility'
-        ]
-        
-        predictions = {}
-        
-        for model_name, model in self.models.items():
-            if not self.is_trained[model_name]:
-                continue
-                
-            try:
-                future_predictions = []
-                
-                for future_date in future_dates:
-                    # Create features for future date
-                    future_features = {
-                        'day_of_week': future_date.weekday(),
-                        'month': future_date.month,
-                        'day_of_year': future_date.timetuple().tm_yday,
-                        'is_weekend': 1 if future_date.weekday() >= 5 else 0,
-                        'transport_emissions': df_prepared['transport_emissions'].mean(),
-                        'food_emissions': df_prepared['food_emissions'].mean(),
-                        'appliances_emissions': df_prepared['appliances_emissions'].mean(),
-                        'entertainment_emissions': df_prepared['entertainment_emissions'].mean(),
-                        'other_emissions': df_prepared['other_emissions'].mean(),
-                        'rolling_7d_avg': df_prepared['rolling_7d_avg'].iloc[-7:].mean(),
-                        'rolling_30d_avg': df_prepared['rolling_30d_avg'].mean(),
-                        'trend_7d': df_prepared['trend_7d'].mean(),
-                        'emissions_volatility': df_prepared['emissions_volatility'].mean()
-                    }
-                    
-                    # Convert to array and scale
-                    X_future = np.array([[future_features[col] for col in feature_columns]])
-                    X_future_scaled = self.scalers[model_name].transform(X_future)
-                    
-                    # Predict
-                    prediction = model.predict(X_future_scaled)[0]
-                    future_predictions.append(max(0, prediction))  # Ensure non-negative
-                
-                predictions[model_name] = {
-                    'dates': [date.strftime('%Y-%m-%d') for date in future_dates],
-                    'predictions': future_predictions,
-                    'total_predicted': sum(future_predictions),
-                    'daily_average': np.mean(future_predictions)
-                }
-                
-            except Exception as e:
-                predictions[model_name] = {'error': str(e)}
-        
-        return predictions
-    
-    def predict_with_model(self, df: pd.DataFrame, model_name: str, days_ahead: int = 30) -> Dict:
-        """Predict future emissions using a specific model"""
-        if model_name not in self.models:
-            return {"error": f"Model '{model_name}' not available. Available models: {list(self.models.keys())}"}
-        
-        if not self.is_trained[model_name]:
-            return {"error": f"Model '{model_name}' not trained yet. Please train models first."}
-        
-        if df.empty:
-            return {"error": "No historical data available for prediction"}
-        
-        # Prepare base data
-        df_prepared = self.prepare_features(df.copy())
-        latest_date = pd.to_datetime(df_prepared['date']).max()
-        
-        # Generate future dates
-        future_dates = [latest_date + timedelta(days=i+1) for i in range(days_ahead)]
-        
-        # Create feature columns for future predictions
-        feature_columns = [
-            'day_of_week', 'month', 'day_of_year', 'is_weekend',
-            'transport_emissions', 'food_emissions', 'appliances_emissions', 
-            'entertainment_emissions', 'other_emissions',
-            'rolling_7d_avg', 'rolling_30d_avg', 'trend_7d', 'emissions_volatility'
-        ]
-        
-        try:
-            model = self.models[model_name]
-            future_predictions = []
-            
-            for future_date in future_dates:
-                # Create features for future date
-                future_features = {
-                    'day_of_week': future_date.weekday(),
-                    'month': future_date.month,
-                    'day_of_year': future_date.timetuple().tm_yday,
-                    'is_weekend': 1 if future_date.weekday() >= 5 else 0,
-                    'transport_emissions': df_prepared['transport_emissions'].mean(),
-                    'food_emissions': df_prepared['food_emissions'].mean(),
-                    'appliances_emissions': df_prepared['appliances_emissions'].mean(),
-                    'entertainment_emissions': df_prepared['entertainment_emissions'].mean(),
-                    'other_emissions': df_prepared['other_emissions'].mean(),
-                    'rolling_7d_avg': df_prepared['rolling_7d_avg'].iloc[-7:].mean(),
-                    'rolling_30d_avg': df_prepared['rolling_30d_avg'].mean(),
-                    'trend_7d': df_prepared['trend_7d'].mean(),
-                    'emissions_volatility': df_prepared['emissions_volatility'].mean()
-                }
-                
-                # Convert to array and scale
-                X_future = np.array([[future_features[col] for col in feature_columns]])
-                X_future_scaled = self.scalers[model_name].transform(X_future)
-                
-                # Predict
-                prediction = model.predict(X_future_scaled)[0]
-                future_predictions.append(max(0, prediction))  # Ensure non-negative
-            
-            model_info = self.get_model_info()[model_name]
-            
-            return {
-                'model_name': model_name,
-                'model_display_name': model_info['name'],
-                'dates': [date.strftime('%Y-%m-%d') for date in future_dates],
-                'predictions': future_predictions,
-                'total_predicted': sum(future_predictions),
-                'daily_average': np.mean(future_predictions),
-                'model_description': model_info['description']
-            }
-            
-        except Exception as e:
-            return {'error': f"Error predicting with {model_name}: {str(e)}"}
-    
-    def analyze_patterns(self, df: pd.DataFrame) -> Dict:
-        """Analyze patterns in emission data"""
-        if df.empty:
-            return {"error": "No data available for pattern analysis"}
-        
-        df_analysis = self.prepare_features(df.copy())
-        
-        patterns = {
-            'seasonal_patterns': self._analyze_seasonal_patterns(df_analysis),
-            'weekly_patterns': self._analyze_weekly_patterns(df_analysis),
-            'category_patterns': self._analyze_category_patterns(df_analysis),
-            'trend_analysis': self._analyze_trends(df_analysis),
-            'anomalies': self._detect_anomalies(df_analysis)
-        }
-        
-        return patterns
-    
-    def _analyze_seasonal_patterns(self, df: pd.DataFrame) -> Dict:
-        """Analyze seasonal emission patterns"""
-        if 'month' not in df.columns:
-            return {}
-        
-        monthly_avg = df.groupby('month')['carbon_footprint'].agg(['mean', 'std']).round(2)
-        
-        return {
-            'monthly_averages': monthly_avg.to_dict(),
-            'highest_month': int(monthly_avg['mean'].idxmax()),
-            'lowest_month': int(monthly_avg['mean'].idxmin()),
-            'seasonal_variation': float(monthly_avg['mean'].std())
-        }
-    
-    def _analyze_weekly_patterns(self, df: pd.DataFrame) -> Dict:
-        """Analyze weekly emission patterns"""
-        if 'day_of_week' not in df.columns:
-            return {}
-        
-        daily_avg = df.groupby('day_of_week')['carbon_footprint'].mean()
-        day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        
-        return {
-            'daily_averages': dict(zip(day_names, daily_avg.round(2))),
-            'highest_day': day_names[daily_avg.idxmax()],
-            'lowest_day': day_names[daily_avg.idxmin()],
-            'weekend_vs_weekday': {
-                'weekend_avg': float(df[df['is_weekend'] == 1]['carbon_footprint'].mean()),
-                'weekday_avg': float(df[df['is_weekend'] == 0]['carbon_footprint'].mean())
-            }
-        }
-    
-    def _analyze_category_patterns(self, df: pd.DataFrame) -> Dict:
-        """Analyze emission patterns by category"""
-        if 'category' not in df.columns:
-            return {}
-        
-        category_stats = df.groupby('category')['carbon_footprint'].agg(['sum', 'mean', 'count']).round(2)
-        
-        return {
-            'category_totals': category_stats['sum'].to_dict(),
-            'category_averages': category_stats['mean'].to_dict(),
-            'category_frequency': category_stats['count'].to_dict(),
-            'dominant_category': category_stats['sum'].idxmax()
-        }
-    
-    def _analyze_trends(self, df: pd.DataFrame) -> Dict:
-        """Analyze emission trends over time"""
-        if len(df) < 7:
-            return {'error': 'Insufficient data for trend analysis'}
-        
-        df_sorted = df.sort_values('date')
-        
-        # Calculate trend using linear regression
-        X = np.arange(len(df_sorted)).reshape(-1, 1)
-        y = df_sorted['carbon_footprint'].values
-        
-        trend_model = LinearRegression()
-        trend_model.fit(X, y)
-        
-        slope = trend_model.coef_[0]
-        trend_direction = 'increasing' if slope > 0.1 else 'decreasing' if slope < -0.1 else 'stable'
-        
-        return {
-            'overall_trend': trend_direction,
-            'trend_slope': float(slope),
-            'recent_7d_avg': float(df_sorted['carbon_footprint'].tail(7).mean()),
-            'recent_30d_avg': float(df_sorted['carbon_footprint'].tail(30).mean()),
-            'improvement_rate': float(slope * -1)  # Negative slope = improvement
-        }
-    
-    def _detect_anomalies(self, df: pd.DataFrame) -> Dict:
-        """Detect anomalous emission days"""
-        if len(df) < 5:
-            return {}
-        
-        mean_emission = df['carbon_footprint'].mean()
-        std_emission = df['carbon_footprint'].std()
-        threshold = mean_emission + 2 * std_emission
-        
-        anomalies = df[df['carbon_footprint'] > threshold]
-        
-        return {
-            'anomaly_count': len(anomalies),
-            'anomaly_threshold': float(threshold),
-            'anomaly_dates': anomalies['date'].dt.strftime('%Y-%m-%d').tolist() if len(anomalies) > 0 else [],
-            'anomaly_values': anomalies['carbon_footprint'].tolist() if len(anomalies) > 0 else []
-        }
-    
-    def get_model_performance(self) -> Dict:
-        """Get performance metrics of trained models"""
-        performance = {}
-        
-        for model_name in self.models.keys():
-            if self.is_trained[model_name]:
-                performance[model_name] = {
-                    'trained': True,
-                    'feature_importance': self.feature_importance if model_name == 'forest' else None
-                }
-            else:
-                performance[model_name] = {'trained': False}
-        
+"""
+Predictive Analytics Engine for Carbon Footprint Calculator
+Uses machine learning to forecast future emissions and provide insights
+"""
+
+import pandas as pd
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import mean_absolute_error, r2_score
+import joblib
+from joblib import Parallel, delayed
+from datetime import datetime, timedelta
+import json
+from typing import Dict, List, Tuple, Optional
+import warnings
+
+def _stats_and_slope(y: np.ndarray) -> Tuple[float, float, float]:
+    """Fused mean / sample-std / trend-slope pass over one emissions series
+
+    The slope is the closed-form least-squares solution against x=0..n-1,
+    which is exactly what LinearRegression computes for this design matrix
+    without the estimator construction and validation overhead.
+    """
+    n = y.size
+    sum_x = n * (n - 1) / 2.0
+    sum_xx = n * (n - 1) * (2.0 * n - 1) / 6.0
+    sum_y = y.sum()
+    sum_xy = (np.arange(n) * y).sum()
+    slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+    mean = sum_y / n
+    std = np.sqrt(((y - mean) ** 2).sum() / (n - 1)) if n > 1 else 0.0
+    return mean, std, slope
+
+
+# JIT-compile the fused pass when numba is around; the pure-NumPy version
+# above is already vectorized and stays as the fallback
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+    _stats_and_slope = njit(cache=True)(_stats_and_slope)
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, parallel=True)
+    def _forest_predict_kernel(X, features, thresholds, children_left,
+                               children_right, values):
+        """Walk all trees of a flattened forest over every row in parallel
+
+        Operates on the padded 2-D node arrays packed after training, so a
+        predict is pure compiled array walking with no sklearn dispatch.
+        """
+        n_rows = X.shape[0]
+        n_trees = features.shape[0]
+        out = np.zeros(n_rows)
+        for i in prange(n_rows):
+            acc = 0.0
+            for t in range(n_trees):
+                node = 0
+                while children_left[t, node] >= 0:
+                    if X[i, features[t, node]] <= thresholds[t, node]:
+                        node = children_left[t, node]
+                    else:
+                        node = children_right[t, node]
+                acc += values[t, node]
+            out[i] = acc / n_trees
+        return out
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing-window mean via cumulative sums (min_periods=1 semantics)
+
+    One O(N) scan over two prefix-sum reads per output instead of the
+    O(N*W) generic pandas rolling path.
+    """
+    n = values.size
+    cumsum = np.cumsum(np.concatenate(([0.0], values)))
+    idx = np.arange(n)
+    start = np.maximum(idx - window + 1, 0)
+    counts = idx - start + 1
+    return (cumsum[idx + 1] - cumsum[start]) / counts
+
+
+def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing-window sample std via the E[x^2]-E[x]^2 identity
+
+    Matches pandas rolling(...).std(): ddof=1 and NaN for single-element
+    windows. Clamps tiny negative variances from float cancellation.
+    """
+    n = values.size
+    idx = np.arange(n)
+    start = np.maximum(idx - window + 1, 0)
+    counts = (idx - start + 1).astype(np.float64)
+    c1 = np.cumsum(np.concatenate(([0.0], values)))
+    c2 = np.cumsum(np.concatenate(([0.0], values * values)))
+    s1 = c1[idx + 1] - c1[start]
+    s2 = c2[idx + 1] - c2[start]
+    variance = (s2 - s1 * s1 / counts) / np.maximum(counts - 1, 1)
+    std = np.sqrt(np.maximum(variance, 0.0))
+    std[counts < 2] = np.nan
+    return std
+
+
+class PredictiveAnalytics:
+    def __init__(self, load_from: Optional[str] = None):
+        self.models = {
+            'linear': LinearRegression(),
+            'forest': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
+            'gradient_boost': HistGradientBoostingRegressor(max_iter=100, learning_rate=0.1, random_state=42)
+        }
+        # Tree splits are invariant to monotonic rescaling, so a single
+        # scaler is fitted once and only the linear model consumes it
+        self.scaler = StandardScaler()
+        self.is_trained = {
+            'linear': False,
+            'forest': False,
+            'gradient_boost': False
+        }
+        self.feature_importance = {}
+        # Memoized prepare_features output and the constant feature vector
+        # derived from it, reused while the input data is unchanged
+        self._prep_cache = None
+        self._const_cache = None
+        # Flattened forest node arrays for the numba predict kernel
+        self._forest_arrays = None
+
+        if load_from is not None:
+            self.load(load_from)
+
+    def save(self, path: str) -> None:
+        """Persist trained models, scaler and metadata to disk
+
+        joblib specializes NumPy array serialization, and the model arrays
+        (repetitive thresholds, zero-padded values) compress cheaply; lz4 is
+        used when its codec is installed, zlib otherwise.
+        """
+        state = {
+            'models': self.models,
+            'scaler': self.scaler,
+            'is_trained': self.is_trained,
+            'feature_importance': self.feature_importance
+        }
+        try:
+            joblib.dump(state, path, compress=('lz4', 3))
+        except Exception:
+            joblib.dump(state, path, compress=3)
+
+    def load(self, path: str) -> bool:
+        """Restore state written by save(); returns True on success"""
+        try:
+            state = joblib.load(path)
+            self.models = state['models']
+            self.scaler = state['scaler']
+            self.is_trained = state['is_trained']
+            self.feature_importance = state.get('feature_importance', {})
+            # Re-pack the forest for the compiled predict kernel
+            self._forest_arrays = None
+            if NUMBA_AVAILABLE and self.is_trained.get('forest'):
+                self._forest_arrays = self._pack_forest(self.models['forest'])
+            return True
+        except Exception:
+            return False
+    
+    def get_model_info(self) -> Dict[str, Dict]:
+        """Get information about available models"""
+        return {
+            'linear': {
+                'name': 'Linear Regression',
+                'description': 'Simple linear relationship model, fast and interpretable',
+                'best_for': 'Linear trends and patterns',
+                'complexity': 'Low'
+            },
+            'forest': {
+                'name': 'Random Forest',
+                'description': 'Ensemble of decision trees, handles non-linear patterns well',
+                'best_for': 'Complex patterns and feature interactions',
+                'complexity': 'Medium'
+            },
+            'gradient_boost': {
+                'name': 'Gradient Boosting',
+                'description': 'Histogram-based sequential ensemble, often provides highest accuracy',
+                'best_for': 'High accuracy predictions with complex data',
+                'complexity': 'High'
+            }
+        }
+    
+    def get_trained_models(self) -> List[str]:
+        """Get list of successfully trained models"""
+        return [model for model, trained in self.is_trained.items() if trained]
+        
+    def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Prepare features for machine learning models
+
+        Functional: the input frame is never mutated; only the new feature
+        columns are allocated and attached with one assign, so callers no
+        longer need to pass a defensive copy.
+        """
+        if df.empty:
+            return df
+
+        new_cols = {}
+
+        # Convert date to datetime only when it is not already parsed
+        if 'date' in df.columns:
+            dates = df['date']
+            if not np.issubdtype(dates.dtype, np.datetime64):
+                dates = pd.to_datetime(dates)
+            day_of_week = dates.dt.dayofweek
+
+            # Extract temporal features
+            new_cols['date'] = dates
+            new_cols['day_of_week'] = day_of_week
+            new_cols['month'] = dates.dt.month
+            new_cols['day_of_year'] = dates.dt.dayofyear
+            new_cols['is_weekend'] = (day_of_week >= 5).astype(int)
+
+        # Create category-based features
+        categories = ['transport', 'food', 'appliances', 'entertainment', 'other']
+        if 'category' in df.columns and 'carbon_footprint' in df.columns:
+            # Map categories to integer codes once, then scatter each row's
+            # footprint into its (row, code) slot (code -1 = unknown category,
+            # dropped as before)
+            codes = pd.Categorical(df['category'].str.lower(), categories=categories).codes
+            footprint = df['carbon_footprint'].to_numpy(dtype=np.float32)
+            scattered = np.zeros((len(df), len(categories)), dtype=np.float32)
+            valid = codes >= 0
+            scattered[np.nonzero(valid)[0], codes[valid]] = footprint[valid]
+            for j, category in enumerate(categories):
+                new_cols[f'{category}_emissions'] = scattered[:, j]
+        else:
+            for category in categories:
+                new_cols[f'{category}_emissions'] = 0.0
+
+        result = df.assign(**new_cols)
+
+        # Rolling averages (7-day and 30-day) via cumulative-sum kernels;
+        # result is a fresh frame, so in-place column stores are safe
+        if len(result) > 1:
+            result = result.sort_values('date')
+            footprint = result['carbon_footprint'].to_numpy(dtype=np.float64)
+            rolling_7d = _rolling_mean(footprint, 7)
+            result['rolling_7d_avg'] = rolling_7d
+            result['rolling_30d_avg'] = _rolling_mean(footprint, 30)
+
+            # Trend indicators
+            result['trend_7d'] = footprint - rolling_7d
+            result['emissions_volatility'] = _rolling_std(footprint, 7)
+        else:
+            result['rolling_7d_avg'] = result['carbon_footprint']
+            result['rolling_30d_avg'] = result['carbon_footprint']
+            result['trend_7d'] = 0
+            result['emissions_volatility'] = 0
+
+        return result
+    
+    def train_models(self, df: pd.DataFrame) -> Dict[str, float]:
+        """Train predictive models on historical data"""
+        if len(df) < 10:  # Need minimum data for training
+            return {"error": "Insufficient data for training (minimum 10 entries required)"}
+        
+        # Prepare features
+        df_features = self.prepare_features(df)
+        
+        # Select feature columns
+        feature_columns = [
+            'day_of_week', 'month', 'day_of_year', 'is_weekend',
+            'transport_emissions', 'food_emissions', 'appliances_emissions', 
+            'entertainment_emissions', 'other_emissions',
+            'rolling_7d_avg', 'rolling_30d_avg', 'trend_7d', 'emissions_volatility'
+        ]
+        
+        # Ensure all feature columns exist
+        for col in feature_columns:
+            if col not in df_features.columns:
+                df_features[col] = 0
+        
+        # Build a C-contiguous float32 matrix directly so sklearn's
+        # check_array takes it as-is instead of copying; float32 also halves
+        # the bytes moved through the split-finding loops
+        X = np.ascontiguousarray(np.column_stack(
+            [df_features[col].fillna(0).to_numpy(np.float32) for col in feature_columns]))
+        y = df_features['carbon_footprint'].fillna(0).to_numpy(np.float32)
+        
+        if len(X) < 5:
+            return {"error": "Insufficient data for model training"}
+        
+        # Split data: one seeded permutation plus slicing, instead of
+        # train_test_split's extra indexing machinery
+        if len(X) > 20:
+            perm = np.random.default_rng(42).permutation(len(X))
+            cut = int(0.8 * len(X))
+            train_idx, test_idx = perm[:cut], perm[cut:]
+            X_train, X_test = X[train_idx], X[test_idx]
+            y_train, y_test = y[train_idx], y[test_idx]
+        else:
+            X_train, X_test, y_train, y_test = X, X, y, y
+        
+        # Train models in parallel - the three fits share no state, and the
+        # compiled inner loops release the GIL, so threads give max(fit_i)
+        # wall time instead of sum(fit_i). Warnings are silenced only here
+        # rather than module-wide, so the filter-list scan stays off the
+        # hot predict paths.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            fitted = Parallel(n_jobs=len(self.models), prefer='threads')(
+                delayed(self._fit_one)(model_name, X_train, X_test, y_train, y_test, feature_columns)
+                for model_name in self.models
+            )
+
+        results = {}
+        self._forest_arrays = None
+        for model_name, model_result, importance in fitted:
+            results[model_name] = model_result
+            if model_result.get('trained'):
+                self.is_trained[model_name] = True
+                # Store feature importance for Random Forest
+                if importance is not None:
+                    self.feature_importance = importance
+                # Pack the fitted forest for the compiled predict kernel
+                if model_name == 'forest' and NUMBA_AVAILABLE:
+                    self._forest_arrays = self._pack_forest(self.models['forest'])
+
+        return results
+
+    @staticmethod
+    def _pack_forest(model) -> Tuple[np.ndarray, ...]:
+        """Flatten the fitted forest into padded 2-D node arrays
+
+        Each per-tree feature/threshold/children/value array is copied into a
+        (n_trees, max_nodes) matrix so the predict kernel can walk every tree
+        without touching Python-level estimator objects.
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        n_trees = len(trees)
+        max_nodes = max(tree.node_count for tree in trees)
+
+        features = np.full((n_trees, max_nodes), -2, dtype=np.int64)
+        thresholds = np.zeros((n_trees, max_nodes))
+        children_left = np.full((n_trees, max_nodes), -1, dtype=np.int64)
+        children_right = np.full((n_trees, max_nodes), -1, dtype=np.int64)
+        values = np.zeros((n_trees, max_nodes))
+
+        for t, tree in enumerate(trees):
+            n = tree.node_count
+            features[t, :n] = tree.feature
+            thresholds[t, :n] = tree.threshold
+            children_left[t, :n] = tree.children_left
+            children_right[t, :n] = tree.children_right
+            values[t, :n] = tree.value[:, 0, 0]
+
+        return features, thresholds, children_left, children_right, values
+
+    def _model_predict(self, model_name: str, X: np.ndarray) -> np.ndarray:
+        """Predict with the flattened forest kernel when it is available"""
+        if model_name == 'forest' and self._forest_arrays is not None:
+            return _forest_predict_kernel(
+                np.ascontiguousarray(X, dtype=np.float64), *self._forest_arrays)
+        return self.models[model_name].predict(X)
+
+    def _fit_one(self, model_name: str, X_train, X_test, y_train, y_test,
+                 feature_columns: List[str]) -> Tuple[str, Dict, Optional[Dict]]:
+        """Fit and evaluate one model (runs on a joblib worker thread)"""
+        try:
+            model = self.models[model_name]
+
+            # Scale features (linear model only; trees take the raw matrix)
+            if model_name == 'linear':
+                X_train_scaled = self.scaler.fit_transform(X_train)
+                X_test_scaled = self.scaler.transform(X_test)
+            else:
+                X_train_scaled, X_test_scaled = X_train, X_test
+
+            # Train model
+            model.fit(X_train_scaled, y_train)
+
+            # Evaluate
+            y_pred = model.predict(X_test_scaled)
+            mae = mean_absolute_error(y_test, y_pred)
+            r2 = r2_score(y_test, y_pred)
+
+            importance = None
+            if model_name == 'forest':
+                importance = dict(zip(feature_columns, model.feature_importances_))
+
+            return model_name, {'mae': mae, 'r2_score': r2, 'trained': True}, importance
+
+        except Exception as e:
+            return model_name, {'error': str(e), 'trained': False}, None
+    
+    def _prepared_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Run prepare_features, reusing the cached frame when df is unchanged
+
+        Keyed on length plus the last date/footprint values, so repeated
+        predict/analyze calls over the same history skip the feature pass.
+        """
+        key = (len(df), df['date'].iloc[-1], df['carbon_footprint'].iloc[-1])
+        if self._prep_cache is not None and self._prep_cache[0] == key:
+            return self._prep_cache[1]
+
+        df_prepared = self.prepare_features(df)
+        self._prep_cache = (key, df_prepared)
+        return df_prepared
+
+    def _build_future_matrix(self, df_prepared: pd.DataFrame, latest_date,
+                             days_ahead: int) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """Build the (days_ahead, n_features) matrix for future predictions
+
+        Calendar features come from vectorized DatetimeIndex accessors; the
+        per-category means and rolling averages are constant across the
+        horizon, so they are computed once and broadcast to every row.
+        """
+        future_dates = pd.date_range(latest_date + pd.Timedelta(days=1), periods=days_ahead)
+
+        day_of_week = future_dates.dayofweek.to_numpy()
+        calendar_block = np.column_stack([
+            day_of_week,
+            future_dates.month.to_numpy(),
+            future_dates.dayofyear.to_numpy(),
+            (day_of_week >= 5).astype(np.int8)
+        ])
+
+        if self._const_cache is not None and self._const_cache[0] is df_prepared:
+            constant_features = self._const_cache[1]
+        else:
+            constant_features = np.array([
+                df_prepared['transport_emissions'].mean(),
+                df_prepared['food_emissions'].mean(),
+                df_prepared['appliances_emissions'].mean(),
+                df_prepared['entertainment_emissions'].mean(),
+                df_prepared['other_emissions'].mean(),
+                df_prepared['rolling_7d_avg'].iloc[-7:].mean(),
+                df_prepared['rolling_30d_avg'].mean(),
+                df_prepared['trend_7d'].mean(),
+                df_prepared['emissions_volatility'].mean()
+            ])
+            self._const_cache = (df_prepared, constant_features)
+        constant_block = np.broadcast_to(constant_features, (days_ahead, constant_features.size))
+
+        X_future = np.ascontiguousarray(
+            np.hstack([calendar_block, constant_block]), dtype=np.float32)
+        return future_dates, X_future
+
+    def predict_future_emissions(self, df: pd.DataFrame, days_ahead: int = 30) -> Dict:
+        """Predict future emissions for specified number of days"""
+        if not any(self.is_trained.values()):
+            return {"error": "Models not trained yet. Please train models first."}
+
+        if df.empty:
+            return {"error": "No historical data available for prediction"}
+
+        # Prepare base data (cached across repeated calls on the same history)
+        df_prepared = self._prepared_features(df)
+        latest_date = df_prepared['date'].max()
+
+        # One feature matrix covers the whole horizon for every model
+        future_dates, X_future = self._build_future_matrix(df_prepared, latest_date, days_ahead)
+        date_strings = future_dates.strftime('%Y-%m-%d').tolist()
+
+        # Predict the trained models in parallel; each predict runs compiled
+        # code that releases the GIL, so threads overlap cleanly
+        trained = self.get_trained_models()
+        outputs = Parallel(n_jobs=len(trained), prefer='threads')(
+            delayed(self._predict_one)(model_name, X_future, date_strings)
+            for model_name in trained
+        )
+
+        return dict(outputs)
+
+    def _predict_one(self, model_name: str, X_future: np.ndarray,
+                     date_strings: List[str]) -> Tuple[str, Dict]:
+        """Predict one model's horizon (runs on a joblib worker thread)"""
+        try:
+            # Scale and predict the whole horizon in one call
+            X_future_scaled = (self.scaler.transform(X_future)
+                               if model_name == 'linear' else X_future)
+            future_predictions = np.clip(self._model_predict(model_name, X_future_scaled), 0, None)
+
+            return model_name, {
+                'dates': date_strings,
+                'predictions': future_predictions.tolist(),
+                'total_predicted': float(future_predictions.sum()),
+                'daily_average': float(future_predictions.mean())
+            }
+
+        except Exception as e:
+            return model_name, {'error': str(e)}
+    
+    def predict_with_model(self, df: pd.DataFrame, model_name: str, days_ahead: int = 30) -> Dict:
+        """Predict future emissions using a specific model"""
+        if model_name not in self.models:
+            return {"error": f"Model '{model_name}' not available. Available models: {list(self.models.keys())}"}
+        
+        if not self.is_trained[model_name]:
+            return {"error": f"Model '{model_name}' not trained yet. Please train models first."}
+        
+        if df.empty:
+            return {"error": "No historical data available for prediction"}
+        
+        # Prepare base data (cached across repeated calls on the same history)
+        df_prepared = self._prepared_features(df)
+        latest_date = df_prepared['date'].max()
+
+        try:
+            model = self.models[model_name]
+
+            # Build the horizon matrix once, then scale and predict in one call
+            future_dates, X_future = self._build_future_matrix(df_prepared, latest_date, days_ahead)
+            X_future_scaled = (self.scaler.transform(X_future)
+                               if model_name == 'linear' else X_future)
+            future_predictions = np.clip(self._model_predict(model_name, X_future_scaled), 0, None)
+
+            model_info = self.get_model_info()[model_name]
+
+            return {
+                'model_name': model_name,
+                'model_display_name': model_info['name'],
+                'dates': future_dates.strftime('%Y-%m-%d').tolist(),
+                'predictions': future_predictions.tolist(),
+                'total_predicted': float(future_predictions.sum()),
+                'daily_average': float(future_predictions.mean()),
+                'model_description': model_info['description']
+            }
+
+        except Exception as e:
+            return {'error': f"Error predicting with {model_name}: {str(e)}"}
+    
+    def analyze_patterns(self, df: pd.DataFrame) -> Dict:
+        """Analyze patterns in emission data"""
+        if df.empty:
+            return {"error": "No data available for pattern analysis"}
+        
+        df_analysis = self._prepared_features(df)
+        
+        patterns = {
+            'seasonal_patterns': self._analyze_seasonal_patterns(df_analysis),
+            'weekly_patterns': self._analyze_weekly_patterns(df_analysis),
+            'category_patterns': self._analyze_category_patterns(df_analysis),
+            'trend_analysis': self._analyze_trends(df_analysis),
+            'anomalies': self._detect_anomalies(df_analysis)
+        }
+        
+        return patterns
+    
+    def _analyze_seasonal_patterns(self, df: pd.DataFrame) -> Dict:
+        """Analyze seasonal emission patterns"""
+        if 'month' not in df.columns:
+            return {}
+        
+        # Fixed 12-value key domain: bincount sums/sum-of-squares replace the
+        # groupby hash table and double kernel dispatch
+        months = df['month'].to_numpy()
+        footprint = df['carbon_footprint'].to_numpy(dtype=np.float64)
+        counts = np.bincount(months, minlength=13)
+        sums = np.bincount(months, weights=footprint, minlength=13)
+        sums_sq = np.bincount(months, weights=footprint * footprint, minlength=13)
+
+        present = np.nonzero(counts)[0]
+        mean = np.round(sums[present] / counts[present], 2)
+        # Sample std (ddof=1) with NaN for single-entry months, as pandas does
+        variance = (sums_sq[present] - counts[present] * (sums[present] / counts[present]) ** 2)
+        variance = variance / np.maximum(counts[present] - 1, 1)
+        std = np.where(counts[present] > 1, np.round(np.sqrt(np.maximum(variance, 0.0)), 2), np.nan)
+
+        return {
+            'monthly_averages': {
+                'mean': {int(m): float(v) for m, v in zip(present, mean)},
+                'std': {int(m): float(v) for m, v in zip(present, std)}
+            },
+            'highest_month': int(present[np.argmax(mean)]),
+            'lowest_month': int(present[np.argmin(mean)]),
+            'seasonal_variation': float(np.std(mean, ddof=1)) if present.size > 1 else float('nan')
+        }
+    
+    def _analyze_weekly_patterns(self, df: pd.DataFrame) -> Dict:
+        """Analyze weekly emission patterns"""
+        if 'day_of_week' not in df.columns:
+            return {}
+        
+        day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+        # Fixed 7-value key domain: two bincount passes replace the groupby
+        day_of_week = df['day_of_week'].to_numpy()
+        footprint = df['carbon_footprint'].to_numpy(dtype=np.float64)
+        counts = np.bincount(day_of_week, minlength=7)
+        sums = np.bincount(day_of_week, weights=footprint, minlength=7)
+        present = counts > 0
+        daily_avg = np.divide(sums, counts, out=np.zeros(7), where=present)
+
+        weekend_mask = df['is_weekend'].to_numpy() == 1
+        weekend_avg = float(footprint[weekend_mask].mean()) if weekend_mask.any() else float('nan')
+        weekday_avg = float(footprint[~weekend_mask].mean()) if (~weekend_mask).any() else float('nan')
+
+        return {
+            'daily_averages': {day_names[i]: round(float(daily_avg[i]), 2)
+                               for i in range(7) if present[i]},
+            'highest_day': day_names[int(np.argmax(np.where(present, daily_avg, -np.inf)))],
+            'lowest_day': day_names[int(np.argmin(np.where(present, daily_avg, np.inf)))],
+            'weekend_vs_weekday': {
+                'weekend_avg': weekend_avg,
+                'weekday_avg': weekday_avg
+            }
+        }
+    
+    def _analyze_category_patterns(self, df: pd.DataFrame) -> Dict:
+        """Analyze emission patterns by category"""
+        if 'category' not in df.columns:
+            return {}
+        
+        # Encode categories once, then bincount sums/counts per code
+        cats = pd.Categorical(df['category'])
+        footprint = df['carbon_footprint'].to_numpy(dtype=np.float64)
+        n_cats = len(cats.categories)
+        counts = np.bincount(cats.codes, minlength=n_cats)
+        sums = np.bincount(cats.codes, weights=footprint, minlength=n_cats)
+        means = sums / np.maximum(counts, 1)
+
+        return {
+            'category_totals': {c: round(float(s), 2) for c, s in zip(cats.categories, sums)},
+            'category_averages': {c: round(float(m), 2) for c, m in zip(cats.categories, means)},
+            'category_frequency': {c: int(n) for c, n in zip(cats.categories, counts)},
+            'dominant_category': cats.categories[int(np.argmax(sums))]
+        }
+    
+    def _analyze_trends(self, df: pd.DataFrame) -> Dict:
+        """Analyze emission trends over time"""
+        if len(df) < 7:
+            return {'error': 'Insufficient data for trend analysis'}
+        
+        df_sorted = df.sort_values('date')
+
+        # Calculate trend with the closed-form least-squares slope
+        y = df_sorted['carbon_footprint'].to_numpy(dtype=np.float64)
+        _, _, slope = _stats_and_slope(y)
+        trend_direction = 'increasing' if slope > 0.1 else 'decreasing' if slope < -0.1 else 'stable'
+        
+        return {
+            'overall_trend': trend_direction,
+            'trend_slope': float(slope),
+            'recent_7d_avg': float(df_sorted['carbon_footprint'].tail(7).mean()),
+            'recent_30d_avg': float(df_sorted['carbon_footprint'].tail(30).mean()),
+            'improvement_rate': float(slope * -1)  # Negative slope = improvement
+        }
+    
+    def _detect_anomalies(self, df: pd.DataFrame) -> Dict:
+        """Detect anomalous emission days"""
+        if len(df) < 5:
+            return {}
+        
+        mean_emission, std_emission, _ = _stats_and_slope(
+            df['carbon_footprint'].to_numpy(dtype=np.float64))
+        threshold = mean_emission + 2 * std_emission
+        
+        anomalies = df[df['carbon_footprint'] > threshold]
+        
+        return {
+            'anomaly_count': len(anomalies),
+            'anomaly_threshold': float(threshold),
+            'anomaly_dates': anomalies['date'].dt.strftime('%Y-%m-%d').tolist() if len(anomalies) > 0 else [],
+            'anomaly_values': anomalies['carbon_footprint'].tolist() if len(anomalies) > 0 else []
+        }
+    
+    def get_model_performance(self) -> Dict:
+        """Get performance metrics of trained models"""
+        performance = {}
+        
+        for model_name in self.models.keys():
+            if self.is_trained[model_name]:
+                performance[model_name] = {
+                    'trained': True,
+                    'feature_importance': self.feature_importance if model_name == 'forest' else None
+                }
+            else:
+                performance[model_name] = {'trained': False}
+        
         return performance 
\ No newline at end of file
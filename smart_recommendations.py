@@ -1,453 +1,1256 @@
-"""
-Smart Recommendations Engine
-Uses Azure OpenAI to provide personalized carbon reduction suggestions
-"""
-
-import json
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import requests
-from config import get_azure_openai_config
-
-class SmartRecommendations:
-    def __init__(self):
-        self.azure_config = get_azure_openai_config()
-        self.recommendation_cache = {}
-        
-    def generate_personalized_recommendations(self, user_data: Dict, patterns: Dict, predictions: Dict) -> Dict:
-        """Generate personalized recommendations using Azure OpenAI"""
-        try:
-            # Prepare context for AI
-            context = self._prepare_ai_context(user_data, patterns, predictions)
-            
-            # Generate recommendations using Azure OpenAI
-            recommendations = self._call_azure_openai_for_recommendations(context)
-            
-            # Structure and enhance recommendations
-            structured_recommendations = self._structure_recommendations(recommendations, user_data)
-            
-            return structured_recommendations
-            
-        except Exception as e:
-            return {"error": f"Failed to generate recommendations: {str(e)}"}
-    
-    def _prepare_ai_context(self, user_data: Dict, patterns: Dict, predictions: Dict) -> str:
-        """Prepare context data for AI analysis"""
-        
-        # Calculate key metrics
-        total_emissions = user_data.get('total_emissions', 0)
-        daily_average = user_data.get('daily_average', 0)
-        dominant_category = patterns.get('category_patterns', {}).get('dominant_category', 'unknown')
-        trend = patterns.get('trend_analysis', {}).get('overall_trend', 'unknown')
-        
-        # Global context
-        global_average = 36.7  # kg CO2 per day (world average)
-        paris_target = 15.0   # kg CO2 per day (Paris Agreement target)
-        
-        context = f"""
-        User Carbon Footprint Analysis:
-        
-        Current Performance:
-        - Daily average emissions: {daily_average:.1f} kg CO2
-        - Total tracked emissions: {total_emissions:.1f} kg CO2
-        - Dominant emission category: {dominant_category}
-        - Emission trend: {trend}
-        - Performance vs global average ({global_average} kg CO2/day): {'Above' if daily_average > global_average else 'Below'}
-        - Performance vs Paris target ({paris_target} kg CO2/day): {'Above' if daily_average > paris_target else 'Below'}
-        
-        Pattern Analysis:
-        {json.dumps(patterns, indent=2)}
-        
-        Future Predictions:
-        {json.dumps(predictions, indent=2)}
-        
-        Please provide personalized, actionable recommendations to reduce carbon emissions based on this analysis.
-        Focus on the areas with highest impact and provide specific, measurable actions.
-        """
-        
-        return context
-    
-    def _call_azure_openai_for_recommendations(self, context: str) -> Dict:
-        """Call Azure OpenAI API to generate recommendations"""
-        
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": self.azure_config["api_key"]
-        }
-        
-        prompt = f"""
-        You are an expert environmental consultant specializing in carbon footprint reduction.
-        Based on the user's carbon footprint data and patterns, provide specific, actionable recommendations.
-        
-        {context}
-        
-        Please provide recommendations in the following JSON format:
-        {{
-            "priority_actions": [
-                {{
-                    "action": "specific action to take",
-                    "category": "transport/food/appliances/entertainment/other",
-                    "impact": "high/medium/low",
-                    "estimated_reduction": "X.X kg CO2 per day",
-                    "difficulty": "easy/medium/hard",
-                    "timeframe": "immediate/1-week/1-month/3-months"
-                }}
-            ],
-            "quick_wins": [
-                {{
-                    "action": "easy immediate action",
-                    "estimated_reduction": "X.X kg CO2 per day"
-                }}
-            ],
-            "long_term_goals": [
-                {{
-                    "goal": "major lifestyle change",
-                    "estimated_reduction": "X.X kg CO2 per day",
-                    "investment_required": "none/low/medium/high"
-                }}
-            ],
-            "personalized_insights": [
-                "insight about user's specific patterns",
-                "another personalized observation"
-            ],
-            "monthly_challenge": {{
-                "title": "30-day challenge title",
-                "description": "detailed challenge description",
-                "target_reduction": "X.X kg CO2"
-            }}
-        }}
-        
-        Make recommendations specific to the user's data and focus on their dominant emission categories.
-        """
-        
-        payload = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are an expert environmental consultant. Always respond with valid JSON only."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 2000,
-            "temperature": 0.7
-        }
-        
-        try:
-            response = requests.post(
-                self.azure_config["chat_endpoint"],
-                headers=headers,
-                json=payload,
-                params={"api-version": self.azure_config["api_version"]}
-            )
-            
-            if response.status_code == 200:
-                content = response.json()["choices"][0]["message"]["content"]
-                
-                # Clean and parse JSON response
-                content = content.strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                
-                return json.loads(content)
-            else:
-                return {"error": f"API call failed: {response.status_code}"}
-                
-        except Exception as e:
-            # Fallback recommendations if API fails
-            return self._get_fallback_recommendations(context)
-    
-    def _structure_recommendations(self, ai_recommendations: Dict, user_data: Dict) -> Dict:
-        """Structure and enhance AI recommendations with additional data"""
-        
-        if "error" in ai_recommendations:
-            return ai_recommendations
-        
-        # Add additional metadata and structure
-        structured = {
-            "generated_at": datetime.now().isoformat(),
-            "user_profile": {
-                "daily_average": user_data.get('daily_average', 0),
-                "dominant_category": user_data.get('dominant_category', 'unknown'),
-                "improvement_potential": self._calculate_improvement_potential(user_data)
-            },
-            "recommendations": ai_recommendations,
-            "implementation_tracker": self._create_implementation_tracker(ai_recommendations),
-            "progress_metrics": self._define_progress_metrics(ai_recommendations)
-        }
-        
-        return structured
-    
-    def _calculate_improvement_potential(self, user_data: Dict) -> Dict:
-        """Calculate potential for improvement"""
-        daily_avg = user_data.get('daily_average', 0)
-        global_avg = 36.7
-        paris_target = 15.0
-        
-        potential = {
-            "current_vs_global": {
-                "difference": daily_avg - global_avg,
-                "percentage": ((daily_avg - global_avg) / global_avg * 100) if global_avg > 0 else 0
-            },
-            "current_vs_paris": {
-                "difference": daily_avg - paris_target,
-                "percentage": ((daily_avg - paris_target) / paris_target * 100) if paris_target > 0 else 0
-            },
-            "improvement_potential": max(0, daily_avg - paris_target),
-            "sustainability_score": min(100, max(0, (paris_target / daily_avg * 100))) if daily_avg > 0 else 100
-        }
-        
-        return potential
-    
-    def _create_implementation_tracker(self, recommendations: Dict) -> Dict:
-        """Create tracker for recommendation implementation"""
-        tracker = {
-            "priority_actions": [],
-            "quick_wins": [],
-            "long_term_goals": [],
-            "monthly_challenge": {}
-        }
-        
-        # Initialize tracking for each recommendation type
-        for action in recommendations.get("priority_actions", []):
-            tracker["priority_actions"].append({
-                "action": action.get("action", ""),
-                "status": "not_started",
-                "progress": 0,
-                "start_date": None,
-                "target_date": None,
-                "notes": ""
-            })
-        
-        for win in recommendations.get("quick_wins", []):
-            tracker["quick_wins"].append({
-                "action": win.get("action", ""),
-                "status": "not_started",
-                "completed_date": None
-            })
-        
-        for goal in recommendations.get("long_term_goals", []):
-            tracker["long_term_goals"].append({
-                "goal": goal.get("goal", ""),
-                "status": "not_started",
-                "progress": 0,
-                "milestones": [],
-                "target_completion": None
-            })
-        
-        challenge = recommendations.get("monthly_challenge", {})
-        if challenge:
-            tracker["monthly_challenge"] = {
-                "title": challenge.get("title", ""),
-                "status": "not_started",
-                "progress": 0,
-                "start_date": None,
-                "daily_targets": []
-            }
-        
-        return tracker
-    
-    def _define_progress_metrics(self, recommendations: Dict) -> Dict:
-        """Define metrics to track progress"""
-        
-        # Calculate total potential reduction
-        total_potential = 0
-        
-        for action in recommendations.get("priority_actions", []):
-            reduction_str = action.get("estimated_reduction", "0 kg CO2 per day")
-            reduction = self._extract_reduction_value(reduction_str)
-            total_potential += reduction
-        
-        for win in recommendations.get("quick_wins", []):
-            reduction_str = win.get("estimated_reduction", "0 kg CO2 per day")
-            reduction = self._extract_reduction_value(reduction_str)
-            total_potential += reduction
-        
-        metrics = {
-            "total_potential_reduction": total_potential,
-            "target_milestones": [
-                {"percentage": 25, "reduction": total_potential * 0.25, "timeframe": "1 month"},
-                {"percentage": 50, "reduction": total_potential * 0.50, "timeframe": "3 months"},
-                {"percentage": 75, "reduction": total_potential * 0.75, "timeframe": "6 months"},
-                {"percentage": 100, "reduction": total_potential, "timeframe": "1 year"}
-            ],
-            "success_indicators": [
-                "Daily emissions below previous 30-day average",
-                "Completion of 3+ quick wins",
-                "Active progress on 2+ priority actions",
-                "Monthly challenge participation"
-            ]
-        }
-        
-        return metrics
-    
-    def _extract_reduction_value(self, reduction_str: str) -> float:
-        """Extract numerical value from reduction string"""
-        try:
-            import re
-            match = re.search(r'(\d+\.?\d*)', reduction_str)
-            return float(match.group(1)) if match else 0.0
-        except:
-            return 0.0
-    
-    def _get_fallback_recommendations(self, context: str) -> Dict:
-        """Provide fallback recommendations if AI fails"""
-        return {
-            "priority_actions": [
-                {
-                    "action": "Switch to public transportation or bike for short trips",
-                    "category": "transport",
-                    "impact": "high",
-                    "estimated_reduction": "5.0 kg CO2 per day",
-                    "difficulty": "medium",
-                    "timeframe": "immediate"
-                },
-                {
-                    "action": "Reduce meat consumption to 2-3 times per week",
-                    "category": "food",
-                    "impact": "high",
-                    "estimated_reduction": "3.0 kg CO2 per day",
-                    "difficulty": "medium",
-                    "timeframe": "1-week"
-                },
-                {
-                    "action": "Optimize home heating/cooling by 2-3 degrees",
-                    "category": "appliances",
-                    "impact": "medium",
-                    "estimated_reduction": "2.0 kg CO2 per day",
-                    "difficulty": "easy",
-                    "timeframe": "immediate"
-                }
-            ],
-            "quick_wins": [
-                {
-                    "action": "Unplug electronics when not in use",
-                    "estimated_reduction": "0.5 kg CO2 per day"
-                },
-                {
-                    "action": "Take shorter showers (5 minutes instead of 10)",
-                    "estimated_reduction": "0.8 kg CO2 per day"
-                },
-                {
-                    "action": "Switch to LED light bulbs",
-                    "estimated_reduction": "0.3 kg CO2 per day"
-                }
-            ],
-            "long_term_goals": [
-                {
-                    "goal": "Install solar panels or switch to renewable energy",
-                    "estimated_reduction": "8.0 kg CO2 per day",
-                    "investment_required": "high"
-                },
-                {
-                    "goal": "Transition to electric or hybrid vehicle",
-                    "estimated_reduction": "6.0 kg CO2 per day",
-                    "investment_required": "high"
-                }
-            ],
-            "personalized_insights": [
-                "Your carbon footprint analysis suggests room for improvement in multiple categories",
-                "Focus on the largest emission sources for maximum impact"
-            ],
-            "monthly_challenge": {
-                "title": "30-Day Carbon Reduction Challenge",
-                "description": "Implement one quick win and one priority action for 30 days",
-                "target_reduction": "3.0 kg CO2"
-            }
-        }
-    
-    def get_weekly_tips(self, user_patterns: Dict) -> List[Dict]:
-        """Generate weekly tips based on user patterns"""
-        tips = []
-        
-        # Analyze patterns and generate contextual tips
-        if user_patterns.get('weekly_patterns', {}).get('highest_day'):
-            highest_day = user_patterns['weekly_patterns']['highest_day']
-            tips.append({
-                "title": f"Optimize Your {highest_day}",
-                "description": f"Your highest emission day is {highest_day}. Consider planning lower-impact activities on this day.",
-                "category": "pattern-based",
-                "difficulty": "easy"
-            })
-        
-        if user_patterns.get('seasonal_patterns', {}).get('highest_month'):
-            highest_month = user_patterns['seasonal_patterns']['highest_month']
-            month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-            month_name = month_names[highest_month - 1] if 1 <= highest_month <= 12 else 'Unknown'
-            tips.append({
-                "title": f"Prepare for {month_name} Emissions",
-                "description": f"Your emissions tend to be higher in {month_name}. Plan energy-efficient strategies for this period.",
-                "category": "seasonal",
-                "difficulty": "medium"
-            })
-        
-        # Add general weekly tips
-        general_tips = [
-            {
-                "title": "Meatless Monday",
-                "description": "Start the week with plant-based meals to reduce food emissions",
-                "category": "food",
-                "difficulty": "easy"
-            },
-            {
-                "title": "Walk Wednesday",
-                "description": "Choose walking or cycling for mid-week errands",
-                "category": "transport", 
-                "difficulty": "easy"
-            },
-            {
-                "title": "Energy Efficient Friday",
-                "description": "Review and optimize your energy usage before the weekend",
-                "category": "appliances",
-                "difficulty": "easy"
-            }
-        ]
-        
-        tips.extend(general_tips)
-        return tips[:5]  # Return top 5 tips
-    
-    def update_recommendation_progress(self, recommendation_id: str, progress_data: Dict) -> Dict:
-        """Update progress on a specific recommendation"""
-        # This would typically update a database
-        # For now, return the updated progress structure
-        return {
-            "recommendation_id": recommendation_id,
-            "updated_at": datetime.now().isoformat(),
-            "progress": progress_data,
-            "next_steps": self._generate_next_steps(progress_data)
-        }
-    
-    def _generate_next_steps(self, progress_data: Dict) -> List[str]:
-        """Generate next steps based on current progress"""
-        progress = progress_data.get('progress', 0)
-        
-        if progress < 25:
-            return [
-                "Set up daily reminders for your chosen action",
-                "Track your baseline measurements",
-                "Identify potential obstacles and solutions"
-            ]
-        elif progress < 50:
-            return [
-                "Review and adjust your approach if needed",
-                "Celebrate your progress so far",
-                "Consider adding a complementary action"
-            ]
-        elif progress < 75:
-            return [
-                "Document what's working well",
-                "Share your success with others",
-                "Plan for long-term sustainability"
-            ]
-        else:
-            return [
-                "Prepare to maintain this new habit",
-                "Consider taking on a new challenge",
-                "Help others implement similar changes"
-            ] 
\ No newline at end of file
+"""
+Smart Recommendations Engine
+Uses Azure OpenAI to provide personalized carbon reduction suggestions
+"""
+
+import asyncio
+import copy
+import hashlib
+import io
+import json
+import os
+import re
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter, Retry
+from config import get_azure_openai_config
+
+# One pooled session for all Azure calls: keep-alive reuses the warm
+# TLS connection instead of paying the handshake on every request, and
+# transient gateway/throttling failures are retried with backoff
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.3,
+                      status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Optional fast JSON for serializing the pandas-derived analysis dicts
+# into prompt text; orjson handles NumPy scalars natively, the stdlib
+# fallback routes them through default=str
+try:
+    import orjson
+
+    def _dumps_context(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY, default=str).decode('utf-8')
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _dumps_context(obj) -> str:
+        return json.dumps(obj, default=str)
+
+    _json_loads = json.loads
+
+# Optional incremental parser: pulls the message content out of the
+# response body as it streams in, instead of buffering and parsing the
+# whole completion envelope first
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Optional async HTTP client for overlapping many generations at once
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Optional SDK client for the Batch API (bulk/offline generation)
+try:
+    from openai import AzureOpenAI
+    OPENAI_SDK_AVAILABLE = True
+except ImportError:
+    OPENAI_SDK_AVAILABLE = False
+
+# Shape of a valid recommendation payload, mirroring _SYSTEM_PROMPT
+_RECOMMENDATION_SCHEMA = {
+    "type": "object",
+    "required": ["priority_actions", "quick_wins", "long_term_goals",
+                 "personalized_insights", "monthly_challenge"],
+    "properties": {
+        "priority_actions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["action"],
+                "properties": {
+                    "action": {"type": "string"},
+                    "category": {"type": "string"},
+                    "impact": {"type": "string"},
+                    "estimated_reduction": {"type": "string"},
+                    "difficulty": {"type": "string"},
+                    "timeframe": {"type": "string"}
+                }
+            }
+        },
+        "quick_wins": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["action"],
+                "properties": {
+                    "action": {"type": "string"},
+                    "estimated_reduction": {"type": "string"}
+                }
+            }
+        },
+        "long_term_goals": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["goal"],
+                "properties": {
+                    "goal": {"type": "string"},
+                    "estimated_reduction": {"type": "string"},
+                    "investment_required": {"type": "string"}
+                }
+            }
+        },
+        "personalized_insights": {
+            "type": "array",
+            "items": {"type": "string"}
+        },
+        "monthly_challenge": {"type": "object"}
+    }
+}
+
+# Optional compiled validator so malformed model output is caught at the
+# API boundary instead of crashing downstream structuring
+try:
+    import fastjsonschema
+    _VALIDATE_RECS = fastjsonschema.compile(_RECOMMENDATION_SCHEMA)
+except ImportError:
+    fastjsonschema = None
+    _VALIDATE_RECS = None
+
+# Optional compiled scanner for summing huge reduction-string lists
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _sum_reductions_kernel(data):
+        """Sum the first decimal number in each fixed-width byte row
+
+        Mirrors the _RED_RE semantics (digit run plus optional fraction)
+        over a (n, width) uint8 matrix in one compiled pass.
+        """
+        n, width = data.shape
+        total = 0.0
+        for i in range(n):
+            value = 0.0
+            frac = 0.1
+            seen_digit = False
+            in_fraction = False
+            for j in range(width):
+                c = data[i, j]
+                if 48 <= c <= 57:
+                    seen_digit = True
+                    if in_fraction:
+                        value += (c - 48) * frac
+                        frac *= 0.1
+                    else:
+                        value = value * 10.0 + (c - 48)
+                elif c == 46 and seen_digit and not in_fraction:
+                    in_fraction = True
+                elif seen_digit:
+                    break
+            total += value
+        return total
+
+# Bound on cached recommendation payloads before LRU eviction kicks in
+_RECOMMENDATION_CACHE_MAXSIZE = 512
+
+# Embedding deployment used for the semantic cache lookups
+_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+
+# Minimum cosine similarity for a stored context to be reused as-is
+_SEMANTIC_SIM_THRESHOLD = 0.92
+
+# Smaller/faster chat deployment for interactive calls, when one exists
+_MINI_DEPLOYMENT = os.getenv("AZURE_OPENAI_MINI_DEPLOYMENT", "")
+
+# Analysis keys the prompt actually draws on; everything else (notably
+# the per-day prediction arrays) only inflates the token bill
+_PATTERN_KEYS = ('category_patterns', 'trend_analysis', 'weekly_patterns', 'seasonal_patterns')
+_PREDICTION_KEYS = ('total_predicted', 'daily_average')
+
+# First number in an "X.X kg CO2 per day" style reduction string
+_RED_RE = re.compile(r'(\d+\.?\d*)')
+
+# List size past which reduction strings are summed through the
+# vectorized pandas extractor instead of a Python loop
+_VECTORIZE_THRESHOLD = 32
+
+# Larger threshold for dispatching to the compiled byte scanner, so the
+# JIT warm-up is only paid when there is real work to amortize it
+_NUMBA_THRESHOLD = 64
+
+# Canned recommendations served when the API is unreachable; built once
+# at import instead of re-allocating the literals on every failure
+_FALLBACK_RECS = {
+    "priority_actions": [
+        {
+            "action": "Switch to public transportation or bike for short trips",
+            "category": "transport",
+            "impact": "high",
+            "estimated_reduction": "5.0 kg CO2 per day",
+            "difficulty": "medium",
+            "timeframe": "immediate"
+        },
+        {
+            "action": "Reduce meat consumption to 2-3 times per week",
+            "category": "food",
+            "impact": "high",
+            "estimated_reduction": "3.0 kg CO2 per day",
+            "difficulty": "medium",
+            "timeframe": "1-week"
+        },
+        {
+            "action": "Optimize home heating/cooling by 2-3 degrees",
+            "category": "appliances",
+            "impact": "medium",
+            "estimated_reduction": "2.0 kg CO2 per day",
+            "difficulty": "easy",
+            "timeframe": "immediate"
+        }
+    ],
+    "quick_wins": [
+        {
+            "action": "Unplug electronics when not in use",
+            "estimated_reduction": "0.5 kg CO2 per day"
+        },
+        {
+            "action": "Take shorter showers (5 minutes instead of 10)",
+            "estimated_reduction": "0.8 kg CO2 per day"
+        },
+        {
+            "action": "Switch to LED light bulbs",
+            "estimated_reduction": "0.3 kg CO2 per day"
+        }
+    ],
+    "long_term_goals": [
+        {
+            "goal": "Install solar panels or switch to renewable energy",
+            "estimated_reduction": "8.0 kg CO2 per day",
+            "investment_required": "high"
+        },
+        {
+            "goal": "Transition to electric or hybrid vehicle",
+            "estimated_reduction": "6.0 kg CO2 per day",
+            "investment_required": "high"
+        }
+    ],
+    "personalized_insights": [
+        "Your carbon footprint analysis suggests room for improvement in multiple categories",
+        "Focus on the largest emission sources for maximum impact"
+    ],
+    "monthly_challenge": {
+        "title": "30-Day Carbon Reduction Challenge",
+        "description": "Implement one quick win and one priority action for 30 days",
+        "target_reduction": "3.0 kg CO2"
+    }
+}
+
+@lru_cache(maxsize=256)
+def _weekly_tips_for(highest_day, highest_month) -> Tuple[Dict, ...]:
+    """Build the (at most five) weekly tips for one day/month pair
+
+    Cached because get_weekly_tips is pure over these two fields and is
+    called on every UI refresh; callers copy the dicts before mutating.
+    """
+    tips = []
+
+    # Analyze patterns and generate contextual tips
+    if highest_day:
+        tips.append({
+            "title": f"Optimize Your {highest_day}",
+            "description": f"Your highest emission day is {highest_day}. Consider planning lower-impact activities on this day.",
+            "category": "pattern-based",
+            "difficulty": "easy"
+        })
+
+    if highest_month:
+        month_name = _MONTH_NAMES[(highest_month - 1) % 12] if isinstance(highest_month, int) else 'Unknown'
+        tips.append({
+            "title": f"Prepare for {month_name} Emissions",
+            "description": f"Your emissions tend to be higher in {month_name}. Plan energy-efficient strategies for this period.",
+            "category": "seasonal",
+            "difficulty": "medium"
+        })
+
+    # Add general weekly tips
+    tips.extend(_GENERAL_TIPS)
+    return tuple(tips[:5])  # Return top 5 tips
+
+
+def _archetype_recommendations(category: str) -> Dict:
+    """Canned recommendation set for one archetype, lead category first"""
+    recs = copy.deepcopy(_FALLBACK_RECS)
+    recs["priority_actions"].sort(key=lambda action: action.get("category") != category)
+    recs["personalized_insights"] = [
+        f"Your footprint matches a typical {category}-dominant profile",
+        f"Focus on {category} first - it is your largest emission source"
+    ]
+    return recs
+
+
+# Typical user profiles and their precomputed recommendations: daily
+# averages near these archetypes with a matching dominant category are
+# served directly, with no tokens spent
+_ARCHETYPE_EPSILON = 1.5
+_ARCHETYPES = tuple(
+    (daily, category, _archetype_recommendations(category))
+    for daily in (15.0, 30.0, 50.0)
+    for category in ('transport', 'food', 'appliances')
+)
+
+# Month abbreviations indexed by (month - 1)
+_MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# Next-step guidance per progress quartile, indexed by progress // 25
+_NEXT_STEPS = (
+    (
+        "Set up daily reminders for your chosen action",
+        "Track your baseline measurements",
+        "Identify potential obstacles and solutions"
+    ),
+    (
+        "Review and adjust your approach if needed",
+        "Celebrate your progress so far",
+        "Consider adding a complementary action"
+    ),
+    (
+        "Document what's working well",
+        "Share your success with others",
+        "Plan for long-term sustainability"
+    ),
+    (
+        "Prepare to maintain this new habit",
+        "Consider taking on a new challenge",
+        "Help others implement similar changes"
+    )
+)
+
+# Rotating general tips appended to the pattern-specific weekly tips
+_GENERAL_TIPS = (
+    {
+        "title": "Meatless Monday",
+        "description": "Start the week with plant-based meals to reduce food emissions",
+        "category": "food",
+        "difficulty": "easy"
+    },
+    {
+        "title": "Walk Wednesday",
+        "description": "Choose walking or cycling for mid-week errands",
+        "category": "transport",
+        "difficulty": "easy"
+    },
+    {
+        "title": "Energy Efficient Friday",
+        "description": "Review and optimize your energy usage before the weekend",
+        "category": "appliances",
+        "difficulty": "easy"
+    }
+)
+
+# Static instructions + output schema sent as the system message on
+# every chat call. Deliberately a plain string constant - any byte of
+# drift in this prefix (an f-string, reflowed whitespace) would defeat
+# Azure's prompt caching, which matches on identical prefixes
+_SYSTEM_PROMPT = """You are an expert environmental consultant specializing in carbon footprint reduction.
+Based on the user's carbon footprint data and patterns, provide specific, actionable recommendations.
+Always respond with valid JSON only, in the following format:
+{
+    "priority_actions": [
+        {
+            "action": "specific action to take",
+            "category": "transport/food/appliances/entertainment/other",
+            "impact": "high/medium/low",
+            "estimated_reduction": "X.X kg CO2 per day",
+            "difficulty": "easy/medium/hard",
+            "timeframe": "immediate/1-week/1-month/3-months"
+        }
+    ],
+    "quick_wins": [
+        {
+            "action": "easy immediate action",
+            "estimated_reduction": "X.X kg CO2 per day"
+        }
+    ],
+    "long_term_goals": [
+        {
+            "goal": "major lifestyle change",
+            "estimated_reduction": "X.X kg CO2 per day",
+            "investment_required": "none/low/medium/high"
+        }
+    ],
+    "personalized_insights": [
+        "insight about user's specific patterns",
+        "another personalized observation"
+    ],
+    "monthly_challenge": {
+        "title": "30-day challenge title",
+        "description": "detailed challenge description",
+        "target_reduction": "X.X kg CO2"
+    }
+}
+Make recommendations specific to the user's data and focus on their dominant emission categories."""
+
+# Tracker records as slots dataclasses: fixed attribute slots instead
+# of a fresh hash table per literal, which matters on bulk runs that
+# build thousands of trackers. orjson serializes dataclasses natively;
+# asdict covers every other consumer.
+@dataclass(slots=True)
+class ActionTracker:
+    action: str = ""
+    status: str = "not_started"
+    progress: int = 0
+    start_date: Optional[str] = None
+    target_date: Optional[str] = None
+    notes: str = ""
+
+
+@dataclass(slots=True)
+class QuickWinTracker:
+    action: str = ""
+    status: str = "not_started"
+    completed_date: Optional[str] = None
+
+
+@dataclass(slots=True)
+class GoalTracker:
+    goal: str = ""
+    status: str = "not_started"
+    progress: int = 0
+    milestones: List = field(default_factory=list)
+    target_completion: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ChallengeTracker:
+    title: str = ""
+    status: str = "not_started"
+    progress: int = 0
+    start_date: Optional[str] = None
+    daily_targets: List = field(default_factory=list)
+
+
+class SmartRecommendations:
+    def __init__(self):
+        self.azure_config = get_azure_openai_config()
+        # Interactive calls go to the mini deployment when configured;
+        # recommendation JSON does not need the full-size model
+        if _MINI_DEPLOYMENT:
+            self.chat_endpoint = (
+                f"{self.azure_config['endpoint']}openai/deployments/"
+                f"{_MINI_DEPLOYMENT}/chat/completions")
+        else:
+            self.chat_endpoint = self.azure_config["chat_endpoint"]
+        # Placeholder credentials mean no Azure call can succeed, so the
+        # semantic-cache embedding probe should not even be attempted
+        api_key = self.azure_config.get("api_key", "")
+        self.api_available = bool(api_key) and api_key != "your-api-key-here" and len(api_key) >= 10
+        # Flipped off permanently on the first definitive 404 from the
+        # embeddings endpoint (deployment does not exist)
+        self._embeddings_available = True
+        # Keyed by a hash of the exact inputs; ordered so the least
+        # recently used entry can be evicted when the cache fills up
+        self.recommendation_cache = OrderedDict()
+        # Semantic cache: L2-normalized context embeddings stacked into a
+        # float32 matrix, with the cached payloads stored in parallel
+        self._emb_mat = None
+        self._emb_responses = []
+        # Submitted Batch API jobs: batch_id -> {custom_id: user_data},
+        # needed to structure the results when they come back
+        self._batch_user_data = {}
+        self._batch_client = None
+
+    def generate_personalized_recommendations(self, user_data: Dict, patterns: Dict, predictions: Dict) -> Dict:
+        """Generate personalized recommendations using Azure OpenAI"""
+        try:
+            # Identical inputs produce identical recommendations, so skip
+            # the Azure round-trip when this exact request was seen before
+            cache_key = self._cache_key(user_data, patterns, predictions)
+            if cache_key in self.recommendation_cache:
+                self.recommendation_cache.move_to_end(cache_key)
+                return dict(self.recommendation_cache[cache_key])
+
+            # Typical profiles are served straight from the archetype
+            # table - no context, no tokens, no network
+            archetype = self._match_archetype(user_data, patterns)
+            if archetype is not None:
+                return self._structure_recommendations(copy.deepcopy(archetype), user_data)
+
+            # Prepare context for AI
+            context = self._prepare_ai_context(user_data, patterns, predictions)
+
+            # Near-duplicate profiles (e.g. daily averages a fraction of a
+            # kg apart) hash differently but call for the same advice, so
+            # try a semantic match before paying for a chat completion
+            embedding = self._embed_context(context)
+            if embedding is not None:
+                cached = self._semantic_lookup(embedding)
+                if cached is not None:
+                    return cached
+
+            # Generate recommendations using Azure OpenAI
+            recommendations = self._call_azure_openai_for_recommendations(context)
+            is_fallback = recommendations.pop("_fallback", False)
+
+            # Structure and enhance recommendations
+            structured_recommendations = self._structure_recommendations(recommendations, user_data)
+
+            # Only cache real generations - canned fallback output must
+            # stay uncached so the next call retries the API
+            if "error" not in structured_recommendations and not is_fallback:
+                self.recommendation_cache[cache_key] = structured_recommendations
+                while len(self.recommendation_cache) > _RECOMMENDATION_CACHE_MAXSIZE:
+                    self.recommendation_cache.popitem(last=False)
+                if embedding is not None:
+                    self._semantic_store(embedding, structured_recommendations)
+
+            return structured_recommendations
+
+        except Exception as e:
+            return {"error": f"Failed to generate recommendations: {str(e)}"}
+
+    @staticmethod
+    def _cache_key(user_data: Dict, patterns: Dict, predictions: Dict) -> str:
+        """Deterministic hash of the recommendation inputs"""
+        canonical = json.dumps(
+            {"u": user_data, "p": patterns, "pr": predictions},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _match_archetype(user_data: Dict, patterns: Dict) -> Optional[Dict]:
+        """Find a precomputed archetype close enough to serve directly"""
+        daily = user_data.get('daily_average')
+        dominant = (patterns.get('category_patterns', {}).get('dominant_category')
+                    or user_data.get('dominant_category'))
+        if daily is None or not dominant:
+            return None
+        for archetype_daily, category, recommendations in _ARCHETYPES:
+            if category == dominant and abs(daily - archetype_daily) < _ARCHETYPE_EPSILON:
+                return recommendations
+        return None
+
+    def _embed_context(self, context: str) -> Optional[np.ndarray]:
+        """Embed a context string for semantic cache lookups
+
+        Returns an L2-normalized float32 vector, or None when the
+        embeddings endpoint is unavailable (the caller then falls back to
+        a regular chat completion). Skipped entirely when credentials are
+        placeholders or the deployment is known to be missing, so broken
+        installations do not pay a failed round-trip per generate.
+        """
+        if not self.api_available or not self._embeddings_available:
+            return None
+        try:
+            endpoint = f"{self.azure_config['endpoint']}openai/deployments/{_EMBEDDING_DEPLOYMENT}/embeddings"
+            response = _SESSION.post(
+                endpoint,
+                headers={
+                    "Content-Type": "application/json",
+                    "api-key": self.azure_config["api_key"]
+                },
+                json={"input": context},
+                params={"api-version": self.azure_config["api_version"]},
+                timeout=(3.05, 30)
+            )
+            if response.status_code == 404:
+                # No such embeddings deployment - stop probing for good
+                self._embeddings_available = False
+                return None
+            if response.status_code != 200:
+                return None
+            vector = np.asarray(response.json()["data"][0]["embedding"], dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm > 0 else None
+        except Exception:
+            return None
+
+    def _semantic_lookup(self, embedding: np.ndarray) -> Optional[Dict]:
+        """Return a cached payload whose context is close enough to reuse
+
+        Cosine similarities against every stored context come from a
+        single matrix-vector product over the normalized embeddings.
+        """
+        if self._emb_mat is None or len(self._emb_responses) == 0:
+            return None
+        sims = self._emb_mat @ embedding
+        best = int(np.argmax(sims))
+        if sims[best] >= _SEMANTIC_SIM_THRESHOLD:
+            return dict(self._emb_responses[best])
+        return None
+
+    def _semantic_store(self, embedding: np.ndarray, structured: Dict) -> None:
+        """Add a context embedding and its payload to the semantic cache"""
+        row = embedding.reshape(1, -1)
+        if self._emb_mat is None:
+            self._emb_mat = row
+        else:
+            self._emb_mat = np.vstack([self._emb_mat, row])
+        self._emb_responses.append(structured)
+        # Drop the oldest entries once over capacity
+        if len(self._emb_responses) > _RECOMMENDATION_CACHE_MAXSIZE:
+            self._emb_mat = self._emb_mat[1:]
+            self._emb_responses.pop(0)
+    
+    def _prepare_ai_context(self, user_data: Dict, patterns: Dict, predictions: Dict) -> str:
+        """Prepare context data for AI analysis"""
+        
+        # Calculate key metrics
+        total_emissions = user_data.get('total_emissions', 0)
+        daily_average = user_data.get('daily_average', 0)
+        dominant_category = patterns.get('category_patterns', {}).get('dominant_category', 'unknown')
+        trend = patterns.get('trend_analysis', {}).get('overall_trend', 'unknown')
+        
+        # Global context
+        global_average = 36.7  # kg CO2 per day (world average)
+        paris_target = 15.0   # kg CO2 per day (Paris Agreement target)
+        
+        context = f"""
+        User Carbon Footprint Analysis:
+        
+        Current Performance:
+        - Daily average emissions: {daily_average:.1f} kg CO2
+        - Total tracked emissions: {total_emissions:.1f} kg CO2
+        - Dominant emission category: {dominant_category}
+        - Emission trend: {trend}
+        - Performance vs global average ({global_average} kg CO2/day): {'Above' if daily_average > global_average else 'Below'}
+        - Performance vs Paris target ({paris_target} kg CO2/day): {'Above' if daily_average > paris_target else 'Below'}
+        
+        Pattern Analysis:
+        {_dumps_context(self._prune_patterns(patterns))}
+
+        Future Predictions:
+        {_dumps_context(self._prune_predictions(predictions))}
+        
+        Please provide personalized, actionable recommendations to reduce carbon emissions based on this analysis.
+        Focus on the areas with highest impact and provide specific, measurable actions.
+        """
+        
+        return context
+
+    @staticmethod
+    def _prune_patterns(patterns: Dict) -> Dict:
+        """Keep only the pattern sections the prompt draws on"""
+        return {key: patterns[key] for key in _PATTERN_KEYS if key in patterns}
+
+    @staticmethod
+    def _prune_predictions(predictions: Dict) -> Dict:
+        """Keep per-model summary numbers, dropping the day-by-day arrays"""
+        pruned = {}
+        for model, result in predictions.items():
+            if isinstance(result, dict):
+                pruned[model] = {key: result[key] for key in _PREDICTION_KEYS if key in result}
+            else:
+                pruned[model] = result
+        return pruned
+
+    def _build_recommendation_payload(self, context: str) -> Dict:
+        """Build the chat-completions payload for a recommendation request
+
+        The system message is the byte-identical _SYSTEM_PROMPT constant
+        on every call; only the user message varies, so Azure's prompt
+        cache can serve the shared prefix at a discount.
+        """
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": _SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": context
+                }
+            ],
+            "max_tokens": 800,
+            "temperature": 0.7,
+            "response_format": {"type": "json_object"}
+        }
+
+    @staticmethod
+    def _parse_recommendation_content(content: str) -> Dict:
+        """Clean and parse the JSON body of a model response
+
+        response_format keeps fences out of compliant responses, so the
+        stripping is usually a no-op; removeprefix/removesuffix return
+        the string unchanged without a slicing copy in that case.
+        """
+        content = (content.strip()
+                   .removeprefix("```json").removeprefix("```")
+                   .removesuffix("```"))
+        return _json_loads(content)
+
+    def _call_azure_openai_for_recommendations(self, context: str) -> Dict:
+        """Call Azure OpenAI API to generate recommendations"""
+
+        headers = {
+            "Content-Type": "application/json",
+            "api-key": self.azure_config["api_key"]
+        }
+
+        payload = self._build_recommendation_payload(context)
+
+        try:
+            response = _SESSION.post(
+                self.chat_endpoint,
+                headers=headers,
+                json=payload,
+                params={"api-version": self.azure_config["api_version"]},
+                timeout=(3.05, 30),
+                stream=IJSON_AVAILABLE
+            )
+
+            if response.status_code == 200:
+                if IJSON_AVAILABLE:
+                    # Pull just choices[0].message.content off the wire
+                    # instead of materializing the full envelope
+                    response.raw.decode_content = True
+                    content = next(
+                        ijson.items(response.raw, 'choices.item.message.content'), None)
+                    if content is None:
+                        return {"error": "API response missing content"}
+                else:
+                    content = response.json()["choices"][0]["message"]["content"]
+                parsed = self._parse_recommendation_content(content)
+                if _VALIDATE_RECS is not None:
+                    try:
+                        _VALIDATE_RECS(parsed)
+                    except fastjsonschema.JsonSchemaException:
+                        # A short repair re-ask is far cheaper than
+                        # regenerating from the full context
+                        parsed = self._repair_recommendation_json(content)
+                return parsed
+            else:
+                return {"error": f"API call failed: {response.status_code}"}
+
+        except Exception as e:
+            # Fallback recommendations if API fails
+            return self._get_fallback_recommendations(context)
+
+    def _get_batch_client(self):
+        """Lazily build the AzureOpenAI SDK client used for Batch jobs"""
+        if self._batch_client is None:
+            self._batch_client = AzureOpenAI(
+                azure_endpoint=self.azure_config["endpoint"],
+                api_key=self.azure_config["api_key"],
+                api_version=self.azure_config["api_version"]
+            )
+        return self._batch_client
+
+    def generate_batch(self, users: List[Dict]) -> Dict:
+        """Submit recommendation generation for many users as one Batch job
+
+        Each entry in ``users`` is ``{"user_id", "user_data", "patterns",
+        "predictions"}``. Batch completions run at half the token cost on
+        a separate quota, so nightly bulk runs neither pay interactive
+        prices nor contend with live traffic. Returns the batch id to poll
+        with collect_batch_results.
+        """
+        if not OPENAI_SDK_AVAILABLE:
+            return {"error": "openai SDK not available for batch generation"}
+
+        lines = []
+        user_data_by_id = {}
+        for position, entry in enumerate(users):
+            custom_id = str(entry.get("user_id", position))
+            context = self._prepare_ai_context(
+                entry.get("user_data", {}), entry.get("patterns", {}), entry.get("predictions", {}))
+            body = self._build_recommendation_payload(context)
+            body["model"] = self.azure_config["deployment_name"]
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": body
+            }))
+            user_data_by_id[custom_id] = entry.get("user_data", {})
+
+        try:
+            client = self._get_batch_client()
+            batch_file = client.files.create(
+                file=io.BytesIO("\n".join(lines).encode('utf-8')),
+                purpose="batch"
+            )
+            batch = client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/chat/completions",
+                completion_window="24h"
+            )
+        except Exception as e:
+            return {"error": f"Failed to submit batch: {str(e)}"}
+
+        self._batch_user_data[batch.id] = user_data_by_id
+        return {"batch_id": batch.id, "status": batch.status, "user_count": len(lines)}
+
+    def collect_batch_results(self, batch_id: str) -> Dict:
+        """Poll a submitted batch and structure its results when finished
+
+        Returns ``{"status": ...}`` while the job is still running; once
+        completed, returns ``{"status": "completed", "results":
+        {custom_id: structured_recommendations}}``.
+        """
+        if not OPENAI_SDK_AVAILABLE:
+            return {"error": "openai SDK not available for batch generation"}
+
+        try:
+            client = self._get_batch_client()
+            batch = client.batches.retrieve(batch_id)
+            if batch.status != "completed":
+                return {"batch_id": batch_id, "status": batch.status}
+
+            output = client.files.content(batch.output_file_id)
+            user_data_by_id = self._batch_user_data.pop(batch_id, {})
+            # One clock reading stamps the whole batch
+            generated_at = datetime.now().isoformat()
+            results = {}
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                custom_id = record.get("custom_id", "")
+                try:
+                    content = record["response"]["body"]["choices"][0]["message"]["content"]
+                    recommendations = self._parse_recommendation_content(content)
+                except Exception as e:
+                    results[custom_id] = {"error": f"Failed to parse batch result: {str(e)}"}
+                    continue
+                results[custom_id] = self._structure_recommendations(
+                    recommendations, user_data_by_id.get(custom_id, {}), generated_at)
+
+            return {"batch_id": batch_id, "status": "completed", "results": results}
+
+        except Exception as e:
+            return {"error": f"Failed to collect batch results: {str(e)}"}
+
+    def generate_many(self, inputs: List[Dict], max_workers: int = 16) -> List[Dict]:
+        """Generate recommendations for many users concurrently
+
+        Each entry is ``{"user_data", "patterns", "predictions"}``. The
+        calls are I/O bound against the pooled session, so a thread pool
+        turns N serial API latencies into roughly max_workers-way
+        overlap, with 429 throttling absorbed by the session's retry
+        backoff. A failure is returned in place as an error dict without
+        aborting the rest of the batch.
+        """
+        def _one(entry: Dict) -> Dict:
+            try:
+                return self.generate_personalized_recommendations(
+                    entry.get("user_data", {}),
+                    entry.get("patterns", {}),
+                    entry.get("predictions", {}))
+            except Exception as e:
+                return {"error": f"Failed to generate recommendations: {str(e)}"}
+
+        if not inputs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(inputs))) as executor:
+            return list(executor.map(_one, inputs))
+
+    def stream_personalized_recommendations(self, user_data: Dict, patterns: Dict, predictions: Dict):
+        """Stream recommendation generation as the model produces it
+
+        Yields ``{"type": "delta", "content": str}`` events as tokens
+        arrive so a UI can show progress within a few hundred ms instead
+        of waiting for the full response, followed by one
+        ``{"type": "complete", "recommendations": dict}`` event carrying
+        the same structured payload the non-streaming path returns.
+        """
+        try:
+            context = self._prepare_ai_context(user_data, patterns, predictions)
+        except Exception as e:
+            yield {"type": "complete",
+                   "recommendations": {"error": f"Failed to generate recommendations: {str(e)}"}}
+            return
+
+        buffer = []
+        try:
+            payload = self._build_recommendation_payload(context)
+            payload["stream"] = True
+            response = _SESSION.post(
+                self.chat_endpoint,
+                headers={
+                    "Content-Type": "application/json",
+                    "api-key": self.azure_config["api_key"]
+                },
+                json=payload,
+                params={"api-version": self.azure_config["api_version"]},
+                stream=True,
+                timeout=(3.05, 30)
+            )
+
+            if response.status_code != 200:
+                recommendations = {"error": f"API call failed: {response.status_code}"}
+            else:
+                # Azure streams SSE lines of the form "data: {json chunk}"
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    line = line.decode('utf-8')
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[6:]
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    if not choices:
+                        continue
+                    piece = choices[0].get("delta", {}).get("content")
+                    if piece:
+                        buffer.append(piece)
+                        yield {"type": "delta", "content": piece}
+                recommendations = self._parse_recommendation_content("".join(buffer))
+
+        except Exception:
+            # Fallback recommendations if API fails
+            recommendations = self._get_fallback_recommendations(context)
+
+        recommendations.pop("_fallback", None)
+        yield {"type": "complete",
+               "recommendations": self._structure_recommendations(recommendations, user_data)}
+
+    def _repair_recommendation_json(self, content: str) -> Dict:
+        """Ask the model to fix a malformed response, once
+
+        Sends only the broken output back with a repair instruction at
+        temperature 0; falls back to the canned recommendations if the
+        repair also fails validation.
+        """
+        payload = {
+            "messages": [
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user",
+                 "content": "The following response does not match the required JSON format. "
+                            f"Return only the corrected JSON.\n\n{content}"}
+            ],
+            "max_tokens": 800,
+            "temperature": 0.0,
+            "response_format": {"type": "json_object"}
+        }
+        try:
+            response = _SESSION.post(
+                self.chat_endpoint,
+                headers={
+                    "Content-Type": "application/json",
+                    "api-key": self.azure_config["api_key"]
+                },
+                json=payload,
+                params={"api-version": self.azure_config["api_version"]},
+                timeout=(3.05, 30)
+            )
+            if response.status_code == 200:
+                repaired = self._parse_recommendation_content(
+                    response.json()["choices"][0]["message"]["content"])
+                if _VALIDATE_RECS is not None:
+                    _VALIDATE_RECS(repaired)
+                return repaired
+        except Exception:
+            pass
+        return self._get_fallback_recommendations(content)
+
+    async def agenerate_personalized_recommendations(self, user_data: Dict, patterns: Dict, predictions: Dict) -> Dict:
+        """Async variant of generate_personalized_recommendations
+
+        Lets a web backend overlap many users' generations in one process
+        instead of blocking a worker thread per multi-second Azure call.
+        Falls back to the sync path in a thread when httpx is missing.
+        """
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(
+                self.generate_personalized_recommendations, user_data, patterns, predictions)
+
+        try:
+            cache_key = self._cache_key(user_data, patterns, predictions)
+            if cache_key in self.recommendation_cache:
+                self.recommendation_cache.move_to_end(cache_key)
+                return dict(self.recommendation_cache[cache_key])
+
+            archetype = self._match_archetype(user_data, patterns)
+            if archetype is not None:
+                return self._structure_recommendations(copy.deepcopy(archetype), user_data)
+
+            context = self._prepare_ai_context(user_data, patterns, predictions)
+
+            # The embedding call still uses the pooled sync session, so
+            # run it off the event loop
+            embedding = await asyncio.to_thread(self._embed_context, context)
+            if embedding is not None:
+                cached = self._semantic_lookup(embedding)
+                if cached is not None:
+                    return cached
+
+            recommendations = await self._acall_azure_openai_for_recommendations(context)
+            is_fallback = recommendations.pop("_fallback", False)
+            structured_recommendations = self._structure_recommendations(recommendations, user_data)
+
+            if "error" not in structured_recommendations and not is_fallback:
+                self.recommendation_cache[cache_key] = structured_recommendations
+                while len(self.recommendation_cache) > _RECOMMENDATION_CACHE_MAXSIZE:
+                    self.recommendation_cache.popitem(last=False)
+                if embedding is not None:
+                    self._semantic_store(embedding, structured_recommendations)
+
+            return structured_recommendations
+
+        except Exception as e:
+            return {"error": f"Failed to generate recommendations: {str(e)}"}
+
+    async def _acall_azure_openai_for_recommendations(self, context: str) -> Dict:
+        """Async Azure OpenAI call used by agenerate_personalized_recommendations"""
+        headers = {
+            "Content-Type": "application/json",
+            "api-key": self.azure_config["api_key"]
+        }
+
+        payload = self._build_recommendation_payload(context)
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+        try:
+            try:
+                # HTTP/2 multiplexes concurrent calls over one connection
+                # when the h2 extra is installed
+                client = httpx.AsyncClient(http2=True, limits=limits, timeout=30)
+            except ImportError:
+                client = httpx.AsyncClient(limits=limits, timeout=30)
+
+            async with client:
+                response = await client.post(
+                    self.chat_endpoint,
+                    headers=headers,
+                    json=payload,
+                    params={"api-version": self.azure_config["api_version"]}
+                )
+                if response.status_code == 200:
+                    content = response.json()["choices"][0]["message"]["content"]
+                    return self._parse_recommendation_content(content)
+                return {"error": f"API call failed: {response.status_code}"}
+
+        except Exception:
+            # Fallback recommendations if API fails
+            return self._get_fallback_recommendations(context)
+    
+    def _structure_recommendations(self, ai_recommendations: Dict, user_data: Dict,
+                                   generated_at: Optional[str] = None) -> Dict:
+        """Structure and enhance AI recommendations with additional data
+
+        Bulk callers pass one shared ``generated_at`` timestamp instead
+        of taking a fresh clock reading per record.
+        """
+        if "error" in ai_recommendations:
+            return ai_recommendations
+
+        # Add additional metadata and structure
+        structured = {
+            "generated_at": generated_at or datetime.now().isoformat(),
+            "user_profile": {
+                "daily_average": user_data.get('daily_average', 0),
+                "dominant_category": user_data.get('dominant_category', 'unknown'),
+                "improvement_potential": self._calculate_improvement_potential(user_data)
+            },
+            "recommendations": ai_recommendations,
+            "implementation_tracker": self._create_implementation_tracker(ai_recommendations),
+            "progress_metrics": self._define_progress_metrics(ai_recommendations)
+        }
+        
+        return structured
+    
+    def _calculate_improvement_potential(self, user_data: Dict) -> Dict:
+        """Calculate potential for improvement"""
+        daily_avg = user_data.get('daily_average', 0)
+        global_avg = 36.7
+        paris_target = 15.0
+        
+        potential = {
+            "current_vs_global": {
+                "difference": daily_avg - global_avg,
+                "percentage": ((daily_avg - global_avg) / global_avg * 100) if global_avg > 0 else 0
+            },
+            "current_vs_paris": {
+                "difference": daily_avg - paris_target,
+                "percentage": ((daily_avg - paris_target) / paris_target * 100) if paris_target > 0 else 0
+            },
+            "improvement_potential": max(0, daily_avg - paris_target),
+            "sustainability_score": min(100, max(0, (paris_target / daily_avg * 100))) if daily_avg > 0 else 100
+        }
+        
+        return potential
+
+    @staticmethod
+    def _calculate_improvement_potential_batch(daily: np.ndarray) -> Dict:
+        """Vectorized improvement potential for many users at once
+
+        Mirrors _calculate_improvement_potential but over an array of
+        daily averages, returning arrays in the same shape - four NumPy
+        passes instead of N Python dict constructions for bulk reports.
+        """
+        daily = np.asarray(daily, dtype=np.float64)
+        global_avg = 36.7
+        paris_target = 15.0
+
+        diff_global = daily - global_avg
+        diff_paris = daily - paris_target
+        safe_daily = np.where(daily > 0, daily, 1.0)
+
+        return {
+            "current_vs_global": {
+                "difference": diff_global,
+                "percentage": diff_global / global_avg * 100.0
+            },
+            "current_vs_paris": {
+                "difference": diff_paris,
+                "percentage": diff_paris / paris_target * 100.0
+            },
+            "improvement_potential": np.maximum(0.0, diff_paris),
+            "sustainability_score": np.where(
+                daily > 0,
+                np.clip(paris_target / safe_daily * 100.0, 0.0, 100.0),
+                100.0)
+        }
+
+    def _create_implementation_tracker(self, recommendations: Dict, as_dicts: bool = True) -> Dict:
+        """Create tracker for recommendation implementation
+
+        Records are built as slots dataclasses; by default they are
+        converted to plain dicts at this boundary so existing consumers
+        (and stdlib json) see the same shapes as before. Bulk callers
+        serializing with orjson can pass as_dicts=False to keep the
+        lighter objects.
+        """
+        challenge = recommendations.get("monthly_challenge", {})
+        tracker = {
+            "priority_actions": [
+                ActionTracker(action=action.get("action", ""))
+                for action in recommendations.get("priority_actions", [])
+            ],
+            "quick_wins": [
+                QuickWinTracker(action=win.get("action", ""))
+                for win in recommendations.get("quick_wins", [])
+            ],
+            "long_term_goals": [
+                GoalTracker(goal=goal.get("goal", ""))
+                for goal in recommendations.get("long_term_goals", [])
+            ],
+            "monthly_challenge": ChallengeTracker(title=challenge.get("title", "")) if challenge else {}
+        }
+
+        if as_dicts:
+            for key, value in tracker.items():
+                if isinstance(value, list):
+                    tracker[key] = [asdict(item) for item in value]
+                elif not isinstance(value, dict):
+                    tracker[key] = asdict(value)
+        return tracker
+    
+    def _define_progress_metrics(self, recommendations: Dict) -> Dict:
+        """Define metrics to track progress"""
+        
+        # Calculate total potential reduction
+        reduction_strs = [
+            item.get("estimated_reduction", "0 kg CO2 per day")
+            for key in ("priority_actions", "quick_wins")
+            for item in recommendations.get(key, [])
+        ]
+        if NUMBA_AVAILABLE and len(reduction_strs) > _NUMBA_THRESHOLD:
+            # Pack into fixed-width bytes (the number leads each string,
+            # so 64 bytes always covers it) and scan in compiled code.
+            # Encode lossily: model output can carry non-ASCII (e.g. a
+            # CO2 subscript) and the kernel skips non-digit bytes anyway
+            data = np.array(
+                [s.encode('utf-8', 'replace')[:64] for s in reduction_strs], dtype='S64')
+            total_potential = float(_sum_reductions_kernel(
+                data.view(np.uint8).reshape(len(reduction_strs), -1)))
+        elif len(reduction_strs) > _VECTORIZE_THRESHOLD:
+            # One C-level extract/convert pass beats per-string searches
+            total_potential = float(
+                pd.Series(reduction_strs).str.extract(_RED_RE, expand=False)
+                .astype(float).fillna(0).sum())
+        else:
+            total_potential = sum(self._extract_reduction_value(s) for s in reduction_strs)
+
+        metrics = {
+            "total_potential_reduction": total_potential,
+            "target_milestones": [
+                {"percentage": 25, "reduction": total_potential * 0.25, "timeframe": "1 month"},
+                {"percentage": 50, "reduction": total_potential * 0.50, "timeframe": "3 months"},
+                {"percentage": 75, "reduction": total_potential * 0.75, "timeframe": "6 months"},
+                {"percentage": 100, "reduction": total_potential, "timeframe": "1 year"}
+            ],
+            "success_indicators": [
+                "Daily emissions below previous 30-day average",
+                "Completion of 3+ quick wins",
+                "Active progress on 2+ priority actions",
+                "Monthly challenge participation"
+            ]
+        }
+        
+        return metrics
+    
+    @staticmethod
+    def _extract_reduction_value(reduction_str: str) -> float:
+        """Extract numerical value from reduction string"""
+        match = _RED_RE.search(reduction_str)
+        return float(match.group(1)) if match else 0.0
+    
+    def _get_fallback_recommendations(self, context: str) -> Dict:
+        """Provide fallback recommendations if AI fails
+
+        Deep-copied so downstream structuring/tracking can mutate the
+        result without corrupting the shared constant. The _fallback
+        marker tells callers this is canned output standing in for a
+        failed call - they strip it and must not cache the result, or a
+        transient outage would pin the fallback for those inputs.
+        """
+        recs = copy.deepcopy(_FALLBACK_RECS)
+        recs["_fallback"] = True
+        return recs
+    
+    def get_weekly_tips(self, user_patterns: Dict) -> List[Dict]:
+        """Generate weekly tips based on user patterns
+
+        The tips depend only on the highest emission day and month, so
+        the build is memoized on that pair - UI refreshes with unchanged
+        patterns reuse the cached tuple and only pay for per-dict copies.
+        """
+        highest_day = user_patterns.get('weekly_patterns', {}).get('highest_day')
+        highest_month = user_patterns.get('seasonal_patterns', {}).get('highest_month')
+        return [dict(tip) for tip in _weekly_tips_for(highest_day, highest_month)]
+    
+    def update_recommendation_progress(self, recommendation_id: str, progress_data: Dict) -> Dict:
+        """Update progress on a specific recommendation"""
+        # This would typically update a database
+        # For now, return the updated progress structure
+        return {
+            "recommendation_id": recommendation_id,
+            "updated_at": datetime.now().isoformat(),
+            "progress": progress_data,
+            "next_steps": self._generate_next_steps(progress_data)
+        }
+    
+    def _generate_next_steps(self, progress_data: Dict) -> Tuple[str, ...]:
+        """Generate next steps based on current progress
+
+        Returns the shared immutable tuple for the matching progress
+        quartile - a single clamped index instead of a comparison chain.
+        """
+        progress = progress_data.get('progress', 0)
+        return _NEXT_STEPS[min(max(int(progress), 0) // 25, 3)]
\ No newline at end of file